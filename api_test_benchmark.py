@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+###############################################################################
+# 腳本：API test with xlsx benchmark
+# 功能：在本地模擬接口服務器，生成 10 / 1k / 10k 行用例的 Excel 表，
+#       分階段統計 api_test_with_xlsx 自身的處理速度及內存（不受被測服務器響應時間影響）
+#       讀取 Excel / 讀取測試計劃緩存 / 表達式編譯及執行 / run_api / 生成報告 / get_test_case
+#       執行前先以並發方式回歸檢查登入屏障（登入完成前不應發送其他請求）
+# 用法：python api_test_benchmark.py [--sizes 10,1000,10000] [--save result.json] [--baseline result.json]
+# 日期：18 Oct 2026
+###############################################################################
+
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+try:
+    import openpyxl
+except ImportError:
+    sys.exit('>>>>> 此程序需使用以下第三方庫：openpyxl (pip install [module name]) <<<<<\n')
+
+import api_test_with_xlsx as api
+
+
+# 第一個表格名稱
+sheet1 = 'Basic Data'
+# 第二個表格名稱
+sheet2 = 'Test Case'
+# 模擬導出接口返回的行數
+export_rows = 1000
+# 每種用例在 Excel 表中的循環順序（見 make_workbook）
+case_kinds = ('get', 'form', 'json_ref', 'get', 'form', 'get', 'json', 'upload', 'get', 'export')
+
+
+# 模擬接口服務器：登入、JSON、表單、multipart 上傳及導出接口，收到請求即返回（不等待）
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 響應頭和返回數據分開發送，不關閉 Nagle 算法時每個請求會多等待約 40 毫秒
+    disable_nagle_algorithm = True
+    # 登入接口的響應延遲（秒），見 check_login_barrier
+    login_delay = 0
+    # 未帶登入 cookie 的其他請求路徑（登入屏障失效時出現）
+    violations = []
+
+    def do_GET(self):
+        self.check_cookie()
+        if self.path.startswith('/export'):
+            self.send_body(b''.join(b'%d,name%d\n' % (i, i) for i in range(export_rows)), 'text/csv')
+        elif self.path.startswith('/json'):
+            i = int(self.path.rpartition('=')[2]) if '=' in self.path else 0
+            self.send_body({'rcode': 1000, 'msg': 'ok', 'data': {'id': i, 'items': [{'id': n, 'name': 'item%d' % (n,)} for n in range(10)]}})
+        else:
+            self.send_body({'rcode': 1000, 'msg': 'ok'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self.path == '/user/login':
+            time.sleep(self.login_delay)
+            self.send_body({'rcode': 1000, 'msg': 'success'}, headers={'Set-Cookie': 'sid=bench; Path=/'})
+        else:
+            self.check_cookie()
+            self.send_body({'rcode': 1000, 'msg': 'ok', 'len': len(body)})
+
+    # 作用：記錄未帶登入 cookie 的請求（用例均在登入用例之後，應已帶上 cookie）
+    def check_cookie(self):
+        if 'sid=bench' not in (self.headers.get('Cookie') or ''):
+            StubHandler.violations.append(self.path)
+
+    # 作用：返回響應
+    # 參數：body 返回數據（字典時轉為 JSON）
+    #       content_type 返回數據類型
+    #       headers 其他響應頭
+    def send_body(self, body, content_type='application/json', headers=None):
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# 作用：在後台線程啟動模擬接口服務器
+# 返回：服務器對象和地址（host:port）
+def start_stub_server():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, '127.0.0.1:%d' % (server.server_address[1],)
+
+
+# 作用：生成測試用例 Excel 表（格式同 api_test_with_xlsx.xlsx）：第一條為登入用例，
+#       其餘按 case_kinds 循環生成 GET / 表單 / JSON（含引用 res）/ 上傳 / 導出用例
+# 參數：path Excel 表保存路徑
+#       rows 用例數
+#       api_host 模擬接口服務器地址
+#       upload_file 上傳用例使用的文件
+#       max_workers 並發數
+def make_workbook(path, rows, api_host, upload_file, max_workers):
+    wb = openpyxl.Workbook()
+    ws1 = wb.active
+    ws1.title = sheet1
+    ws1.append(['key', 'value'])
+    ws1.append(['說明', '說明'])
+    for item in (('contact_phone', '-'), ('contact_name', '-'), ('if_mail', 0), ('mail_host', '-'), ('mail_from', '-'), ('mail_pwd', '-'),
+                 ('mail_to_all', '-'), ('mail_to_me', '-'), ('mail_sub', '-'), ('mail_content_random', '-'), ('max_workers', max_workers)):
+        ws1.append(item)
+
+    ws2 = wb.create_sheet(sheet2)
+    ws2.append(['api_id', 'api_title', 'api_host', 'req_url', 'req_method', 'req_data_type', 'req_data', 'req_file', 'check_point', 'is_active'])
+    ws2.append(['說明'] * 10)
+    ws2.append(['login', '登入', api_host, '/user/login', 'post', None, "{'user': 'bench', 'pwd': 'bench'}", None, "$.msg == 'success'", 'yes'])
+    last_get = None
+    for i in range(rows - 1):
+        kind = case_kinds[i % len(case_kinds)]
+        api_id = 'c%d' % (i,)
+        if kind == 'get':
+            row = ['/json', 'get', None, "{'i': %d}" % (i,), None, '$.rcode == 1000 and $.data.id == %d' % (i,)]
+            last_get = api_id
+        elif kind == 'form':
+            row = ['/form', 'post', None, "{'i': %d, 'name': 'name%d'}" % (i, i), None, "resp['rcode'] == 1000"]
+        elif kind == 'json':
+            row = ['/json', 'post', 'application/json', "{'i': %d, 'tags': ['a', 'b']}" % (i,), None, '$.rcode == 1000 and $.len > 0']
+        elif kind == 'json_ref':
+            row = ['/json', 'post', 'application/json', "{'id': res['%s'].data.id}" % (last_get,), None, '$.rcode == 1000'] if last_get else \
+                  ['/json', 'post', 'application/json', "{'i': %d}" % (i,), None, '$.rcode == 1000']
+        elif kind == 'upload':
+            row = ['/upload', 'post', 'multipart/form-data', None, upload_file, '$.len > 0']
+        else:
+            # get_export_rows 不計算標題行
+            row = ['/export', 'get', None, None, None, "export_file == 'bench_export.csv' and get_export_rows(export_file) == %d" % (export_rows - 1,)]
+        ws2.append([api_id, '%s %d' % (kind, i), api_host] + row + ['yes'])
+    wb.save(path)
+
+
+# 作用：記錄一個階段的耗時及內存峰值（內存另外執行一次統計，不影響耗時）
+# 參數：func 該階段執行的函數，返回處理的條數
+#       memory 是否統計內存峰值
+# 返回：{'seconds', 'items', 'per_second', 'peak_mb'}
+def measure(func, memory):
+    time_before = time.perf_counter()
+    items = func()
+    seconds = time.perf_counter() - time_before
+    peak_mb = None
+    if memory:
+        tracemalloc.start()
+        try:
+            func()
+            peak_mb = tracemalloc.get_traced_memory()[1] / 1048576.0
+        finally:
+            tracemalloc.stop()
+    return {'seconds': seconds, 'items': items, 'per_second': items / seconds if seconds else 0, 'peak_mb': peak_mb}
+
+
+# 作用：讀取並編譯 Excel 表中的所有用例（不使用測試計劃緩存）
+# 參數：path Excel 表路徑
+def bench_parse(path):
+    plan_file = '%s.plan' % (os.path.splitext(path)[0],)
+    if os.path.exists(plan_file):
+        os.remove(plan_file)
+    basic_data, test_cases = api.load_test_case_file(path, sheet1, sheet2)
+    return sum(1 for test_case in test_cases)
+
+
+# 作用：通過測試計劃緩存讀取用例（需先執行 bench_parse 生成緩存）
+# 參數：path Excel 表路徑
+def bench_plan_cache(path):
+    basic_data, test_cases = api.load_test_case_file(path, sheet1, sheet2)
+    return sum(1 for test_case in test_cases)
+
+
+# 作用：編譯每條用例的 req_data / check_point 表達式並計算 req_data（不發送請求）
+# 參數：test_cases 已讀取的用例列表
+#       basic_data Excel 中基礎數據
+def bench_expression(test_cases, basic_data):
+    api.expression_cache.clear()
+    res = dict((test_case['api_id'], {'rcode': 1000, 'data': {'id': index}}) for index, test_case in enumerate(test_cases))
+    for test_case in test_cases:
+        for key in ('req_data', 'check_point'):
+            if test_case[key]:
+                api.compile_expression(test_case[key])
+        if test_case['req_data']:
+            api.compile_expression(test_case['req_data'])({'res': res, 'basic_data': basic_data})
+    return len(test_cases)
+
+
+# 作用：逐條執行用例（同一會話池），統計 run_api 及會話處理的開銷
+# 參數：test_cases / basic_data 同 bench_expression
+def bench_run_api(test_cases, basic_data):
+    res = {}
+    sessions = api.SessionPool(basic_data)
+    try:
+        for test_case in test_cases:
+            api.run_test_case(test_case, res, sessions, basic_data)
+    finally:
+        sessions.close()
+    return len(test_cases)
+
+
+# 作用：發送模擬的執行結果事件到郵件報告並生成郵件正文（每 10 條用例一條失敗）
+# 參數：test_cases / basic_data 同 bench_expression
+def bench_report(test_cases, basic_data):
+    sink = api.MailSink(basic_data)
+    report = api.Report([sink])
+    for index, test_case in enumerate(test_cases):
+        failed = index % 10 == 9
+        report.emit({'event': 'case', 'index': index, 'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'api_url': test_case['api_url'],
+                     'success': not failed, 'failures': [['Status Code: 200', 'URL: %s' % (test_case['api_url'],), 'Response: {}']] if failed else [],
+                     'time_spend': 0.01, 'phases': {'ttfb': 0.008, 'download': 0.001, 'parse': 0.0005, 'check': 0.0005}})
+    ''.join(sink.render_problems())
+    sink.render_success()
+    return len(test_cases)
+
+
+# 作用：完整執行 get_test_case（不下發郵件）
+# 參數：path Excel 表路徑
+def bench_get_test_case(path):
+    return len(api.get_test_case(path, sheet1, sheet2))
+
+
+# 作用：回歸檢查登入屏障：登入接口延遲響應並發執行用例，登入完成前不應發送其他請求
+# 參數：work_dir / api_host 同 run_benchmark
+#       max_workers 並發數（大於 1 時才能檢查出問題）
+# 返回：未帶登入 cookie 的請求路徑列表（為空即通過）
+def check_login_barrier(work_dir, api_host, max_workers):
+    upload_file = os.path.join(work_dir, 'bench_upload.bin')
+    with open(upload_file, 'wb') as f:
+        f.write(os.urandom(1024))
+    path = os.path.join(work_dir, 'bench_barrier.xlsx')
+    make_workbook(path, 50, api_host, upload_file, max_workers)
+    StubHandler.login_delay = 0.2
+    del StubHandler.violations[:]
+    try:
+        api.get_test_case(path, sheet1, sheet2)
+    finally:
+        StubHandler.login_delay = 0
+    return list(StubHandler.violations)
+
+
+# 作用：執行所有階段
+# 參數：sizes 用例數列表
+#       work_dir 工作目錄（Excel 表、導出文件、執行歷史）
+#       api_host 模擬接口服務器地址
+#       max_workers 並發數
+#       memory 是否統計內存峰值
+# 返回：每個階段的結果列表 [{'stage', 'rows', 'seconds', 'items', 'per_second', 'peak_mb'}]
+def run_benchmark(sizes, work_dir, api_host, max_workers, memory):
+    upload_file = os.path.join(work_dir, 'bench_upload.bin')
+    with open(upload_file, 'wb') as f:
+        f.write(os.urandom(64 * 1024))
+
+    results = []
+    for rows in sizes:
+        path = os.path.join(work_dir, 'bench_%d.xlsx' % (rows,))
+        make_workbook(path, rows, api_host, upload_file, max_workers)
+        basic_data, test_cases = api.load_test_case_file(path, sheet1, sheet2)
+        test_cases = list(test_cases)
+
+        stages = (
+                ('讀取 Excel', lambda: bench_parse(path)),
+                ('測試計劃緩存', lambda: bench_plan_cache(path)),
+                ('表達式', lambda: bench_expression(test_cases, basic_data)),
+                ('run_api', lambda: bench_run_api(test_cases, basic_data)),
+                ('生成報告', lambda: bench_report(test_cases, basic_data)),
+                ('get_test_case', lambda: bench_get_test_case(path)),
+                )
+        for stage, func in stages:
+            item = measure(func, memory)
+            item.update({'stage': stage, 'rows': rows})
+            results.append(item)
+            print(format_result(item))
+    return results
+
+
+# 作用：把一個階段的結果轉為文字
+# 參數：item run_benchmark 返回的一項
+#       baseline 基準結果中的同一項（可選），顯示速度變化
+def format_result(item, baseline=None):
+    # 階段名稱含中文，放在最後以免影響對齊
+    content = '%6d 行 %9.3f 秒 %11.1f 條/秒' % (item['rows'], item['seconds'], item['per_second'])
+    content = '%s %9.2f MB' % (content, item['peak_mb']) if item['peak_mb'] is not None else '%s %12s' % (content, '-')
+    if baseline:
+        content = '%s %+7.1f%%' % (content, (item['per_second'] / baseline['per_second'] - 1) * 100 if baseline['per_second'] else 0)
+    return '%s  %s' % (content, item['stage'])
+
+
+# 作用：與基準結果比較，找出速度下降超過 tolerance 的階段
+# 參數：results 本次結果
+#       baseline 基準結果（--save 保存的 JSON）
+#       tolerance 允許的下降比例（如 0.2）
+# 返回：退化的階段列表 [(本次結果, 基準結果)]
+def compare_baseline(results, baseline, tolerance):
+    base = dict(((item['stage'], item['rows']), item) for item in baseline)
+    regressions = []
+    for item in results:
+        old = base.get((item['stage'], item['rows']))
+        if old and item['per_second'] < old['per_second'] * (1 - tolerance):
+            regressions.append((item, old))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='api_test_with_xlsx 性能基準測試（本地模擬接口服務器）')
+    parser.add_argument('--sizes', default='10,1000,10000', help='用例數，以「,」分隔（默認：%(default)s）')
+    parser.add_argument('--max-workers', type=int, default=1, help='get_test_case 階段的並發數（默認：%(default)s）')
+    parser.add_argument('--no-memory', action='store_true', help='不統計內存峰值（少執行一次各階段）')
+    parser.add_argument('--save', metavar='FILE', help='保存本次結果（JSON），可作為之後比較的基準')
+    parser.add_argument('--baseline', metavar='FILE', help='與基準結果比較，速度下降超過 --tolerance 時返回非 0')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='允許的速度下降比例（默認：%(default)s）')
+    parser.add_argument('--check-workers', type=int, default=4, help='登入屏障回歸檢查的並發數，0 為不檢查（默認：%(default)s）')
+    args = parser.parse_args()
+
+    # 只統計腳本自身開銷：不輸出逐條用例日誌，執行歷史等保存到臨時目錄
+    logging.getLogger().setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix='api_test_bench_')
+    api.history_file = os.path.join(work_dir, 'api_test_history.db')
+    api.histogram_file = os.path.join(work_dir, 'latency_histogram.json')
+
+    server, api_host = start_stub_server()
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        if args.check_workers:
+            violations = check_login_barrier(work_dir, api_host, args.check_workers)
+            if violations:
+                sys.exit('>>>>> 登入屏障失效：登入完成前已發送 %d 個請求（如 %s） <<<<<' % (len(violations), violations[0]))
+            print('登入屏障檢查通過（並發數：%d）\n' % (args.check_workers,))
+        print('用例數 / 耗時 / 速度 / 內存峰值 / 階段')
+        results = run_benchmark([int(size) for size in args.sizes.split(',')], work_dir, api_host, args.max_workers, not args.no_memory)
+    finally:
+        os.chdir(cwd)
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        base = dict(((item['stage'], item['rows']), item) for item in baseline)
+        print('\n與基準比較（速度變化）：')
+        for item in results:
+            print(format_result(item, base.get((item['stage'], item['rows']))))
+        regressions = compare_baseline(results, baseline, args.tolerance)
+        for item, old in regressions:
+            print('>>>>> 退化：%s（%d 行）%.1f -> %.1f 條/秒 <<<<<' % (item['stage'], item['rows'], old['per_second'], item['per_second']))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -11,9 +11,29 @@
 #     __/ / /-/ / / | /___/ / /_/ / / | /
 #    /___/_/ /_/_/|_|/_____/\____/_/|_|/
 #
-# 日期：22 Aug 2016
-# 版本：v160822
+# 日期：18 Oct 2026
+# 版本：v261018
 # 更新日誌:
+#     18 Oct 2026
+#         * 以只讀模式只打開一次 Excel 表，邊讀取用例邊執行
+#         + 預先編譯 req_data / check_point 並緩存測試計劃（Excel 表未修改時不再讀取）
+#         + 新增壓力測試模式（-m load），統計吞吐量、錯誤率及響應時間百分位數
+#         + 使用單調時鐘記錄用例各階段耗時，累計各接口歷史響應時間直方圖，郵件中顯示百分位數
+#         + 保存每次執行各用例的結果到執行歷史（SQLite），檢查響應時間是否比歷史基準明顯變慢
+#         + 每個主機使用一個保持長連接的會話（共用 Cookie），可設置連接池大小及 HTTP/2 傳輸，統計連接池使用情況
+#         * 連接異常重試改為指數退避加隨機抖動（可按用例設置），等待重試期間其他用例照常執行
+#         * 導出文件逐塊保存到本地並統計行數，記錄導出文件大小及速度
+#         * 使用受限的表達式引擎代替 eval 處理 check_point / req_data（支持 $.data.total 寫法），
+#           登入成功改為通過 login_check 表達式判斷
+#         * 只保留之後的用例會引用到的接口返回數據，過大的返回數據保存到臨時文件
+#         + 執行結果以事件形式邊執行邊發送到報告輸出（郵件、控制台、JUnit XML、JSONL），郵件在最後生成一次
+#         + 分佈式執行：按引用關係把用例分片，交給本地工作進程（-w）或遠程工作節點（-m worker）執行後合併結果
+#         + 新增性能基準測試腳本 api_test_benchmark.py（本地模擬接口服務器），get_test_case 返回各用例執行結果
+#         + 新增異步執行方式（Basic Data：engine = async，使用 aiohttp），各階段耗時改為按線程 / 協程記錄
+#         + get 請求可使用 HTTP 緩存（Basic Data：http_cache），支持條件請求、合併相同請求及按大小刪除最久未使用的緩存
+#         * 上傳文件改為逐塊讀取發送（可多個文件及其他表單字段），重試時重用已計算的請求體長度，記錄上傳大小及速度
+#         + 新增實時指標（--metrics 提供 Prometheus 格式 /metrics，--status-file 定期重寫狀態文件），報告事件增加 start / retry
+#         + 按 res['api_id'] 引用關係調度用例，可並行執行（Basic Data：max_workers）
 #     22 Aug 2016
 #         * 第三方庫「openpyxl」v2.4.0-a1 版本開始捨棄「get_sheet_by_name」
 #           用法（改用：wb[sheetname]）
@@ -41,15 +61,39 @@
 ###############################################################################
 
 
+import argparse
 import operator
+import concurrent.futures
+import contextvars
+import datetime
+import ast
+import asyncio
+import collections.abc
+import hashlib
+import hmac
+import http.client
+import http.server
+import io
+import ipaddress
+import multiprocessing
+import pickle
 import time
+import types
 import re
 import smtplib
+import sqlite3
+import statistics
+import tempfile
+import threading
+import xml.sax.saxutils
 from email.mime.text import MIMEText
 import json
 import logging
+import math
+import mimetypes
 import random
 import os
+import shutil
 import sys
 try:
     # 具體所處項目原因導致使用了「xlrd」和「openpyxl」兩個庫
@@ -62,8 +106,20 @@ try:
     # Excel（xlsx）文件處理
     import openpyxl
     import requests
+    # requests 依賴 urllib3，用於記錄建立連接耗時
+    import urllib3
 except ImportError:
     sys.exit('>>>>> 此程序需使用以下第三方庫：openpyxl / requests (pip install [module name]) <<<<<\n')
+try:
+    # 可選：異步執行（「Basic Data」中 engine 設置為 async 時需要；pip install aiohttp）
+    import aiohttp
+except ImportError:
+    aiohttp = None
+try:
+    # 可選：HTTP/2 傳輸（「Basic Data」中 http_transport 設置為 http2 時需要；pip install 'httpx[http2]'）
+    import httpx
+except ImportError:
+    httpx = None
 #    os.system('pip install [name]')
 #    import [name]
 
@@ -78,6 +134,41 @@ sheet1 = 'Basic Data'
 # 第二個表格名稱
 sheet2 = 'Test Case'
 
+# 執行歷史（每次執行各用例的結果和執行時間）保存路徑
+history_file = os.path.join(os.getcwd(), 'log/api_test_history.db')
+# 測試計劃緩存格式版本（格式改變時舊緩存自動失效）
+plan_format = 4
+# 各接口歷史響應時間直方圖保存路徑
+histogram_file = os.path.join(os.getcwd(), 'log/latency_histogram.json')
+# 直方圖各區間上限（毫秒），超過最後一個上限的計入最後一個區間之後
+latency_buckets = (5, 10, 25, 50, 75, 100, 150, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 15000, 30000, 60000)
+# 用例執行各階段名稱：連接（TCP / TLS 握手）、首字節（發送請求到收到響應頭）、下載響應、解析 JSON、
+#                     檢查點判斷、保存導出文件、重試等待
+phase_names = (('connect', '連接'), ('upload', '上傳'), ('ttfb', '首字節'), ('download', '下載'), ('parse', '解析'), ('check', '檢查'), ('export', '導出'), ('retry_wait', '重試等待'))
+
+# 所有請求共用的請求頭（創建會話時設置一次）
+default_headers = {
+        'X-Requested-With':'XMLHttpRequest',
+        'Connection':'keep-alive',
+        'User-Agent':'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.94 Safari/537.36'
+        }
+# post 請求時各提交數據類型對應的請求頭
+# 上傳文件時不指定 content-type，讓 requests 智能處理更簡單
+content_type_headers = {
+        'application/x-www-form-urlencoded': {'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8'},
+        'application/json': {'Content-Type': 'application/json; charset=UTF-8'},
+        'multipart/form-data': {},
+        }
+
+# 保存導出文件時已統計的行數：文件絕對路徑 -> ((文件大小, 修改時間), 行數)
+export_rows = {}
+# 協調進程與遠程工作節點之間的共享令牌所在請求頭（見 WorkerHandler）
+worker_token_header = 'X-Worker-Token'
+# 發送分片給遠程工作節點的超時時間（秒）：(連接, 等待結果)；工作節點執行完整個分片才返回，等待時間需覆蓋分片執行時間
+worker_timeout = (10, 3600)
+# 上傳文件的 multipart 請求體（見 get_multipart_encoder）：(req_file, 表單字段) -> MultipartEncoder
+upload_encoders = {}
+
 # 日誌文件保存路徑
 log_file = os.path.join(os.getcwd(), 'log/api_test_with_xlsx.log')
 if not os.path.exists('log'):
@@ -87,7 +178,8 @@ if not os.path.exists('log'):
 log_format = '[%(asctime)s] [%(levelname)s] %(message)s'
 # 使用「filename」參數後會自動增加 FileHandler
 # filemode 文件打開模式：a 追加; w 寫入
-logging.basicConfig(format=log_format, filename=log_file, filemode='w', level=logging.DEBUG)
+#     分佈式執行的工作進程（以 spawn 方式啟動時會重新導入本腳本）追加寫入，不清空協調進程的日誌
+logging.basicConfig(format=log_format, filename=log_file, filemode='w' if multiprocessing.parent_process() is None else 'a', level=logging.DEBUG)
 console = logging.StreamHandler()
 console.setLevel(logging.DEBUG)
 formatter = logging.Formatter(log_format)
@@ -127,52 +219,1995 @@ def get_role_id(res_role_query, role_name):
     return None
 
 # 作用：獲取導出的 Excel 總行數（即粉絲總數），供測試數據的 Excel 中調用
+#       文本格式（csv / txt）在保存時已逐塊統計行數；xlsx 以只讀模式逐行讀取；xls 只載入第一張 sheet
 # 參數：export_file 為導出的 Excel 文件名稱
 def get_export_rows(export_file):
-    wb = xlrd.open_workbook(export_file)
-    # 只有一張 sheet
-    ws = wb.sheets()[0]
-    #ws = wb.sheet_by_index(0)
-    #ws = wb.sheet_by_name(u'Sheet1')
-    # 減去標題行
-    return ws.nrows-1
+    stat = os.stat(export_file)
+    counted = export_rows.get(os.path.abspath(export_file))
+    if counted and counted[0] == (stat.st_size, stat.st_mtime):
+        # 減去標題行
+        return counted[1] - 1
 
+    if export_file.lower().endswith(('.csv', '.txt')):
+        rows = 0
+        last_chunk = b''
+        with open(export_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(64 * 1024), b''):
+                rows += chunk.count(b'\n')
+                last_chunk = chunk
+        if last_chunk and not last_chunk.endswith(b'\n'):
+            rows += 1
+        return rows - 1
 
-# 作用：把文本流保存到本地
+    if export_file.lower().endswith('.xlsx'):
+        wb = openpyxl.load_workbook(export_file, read_only=True)
+        try:
+            rows = sum(1 for row in wb.worksheets[0].iter_rows(values_only=True))
+        finally:
+            wb.close()
+        return rows - 1
+
+    # on_demand=True 只載入需要的 sheet
+    wb = xlrd.open_workbook(export_file, on_demand=True)
+    try:
+        # 只有一張 sheet
+        ws = wb.sheet_by_index(0)
+        #ws = wb.sheets()[0]
+        #ws = wb.sheet_by_name(u'Sheet1')
+        # 減去標題行
+        return ws.nrows-1
+    finally:
+        wb.release_resources()
+
+
+# 作用：把接口返回的文本流逐塊保存到本地（不把整個文件讀入內存），文本格式同時統計行數
 # 參數：export_file 為導出的 Excel 文件名稱
-#       resp_content 接口返回的文本流
-def export_fans_info(export_file, resp_content):
+#       r 接口返回的響應（stream=True）
+# 返回：{'bytes': 字節數, 'download': 接收耗時, 'export': 寫文件耗時}
+def export_fans_info(export_file, r):
+    count_lines = export_file.lower().endswith(('.csv', '.txt'))
+    lines = 0
+    last_chunk = b''
+    stats = {'bytes': 0, 'download': 0, 'export': 0}
     with open(export_file, 'wb') as xls:
-        xls.write(resp_content)
+        chunks = r.iter_content(chunk_size=64 * 1024)
+        while True:
+            time_before = time.perf_counter()
+            chunk = next(chunks, None)
+            time_after = time.perf_counter()
+            stats['download'] += time_after - time_before
+            if chunk is None:
+                break
+            xls.write(chunk)
+            stats['export'] += time.perf_counter() - time_after
+            stats['bytes'] += len(chunk)
+            if count_lines:
+                lines += chunk.count(b'\n')
+            last_chunk = chunk or last_chunk
+    if count_lines:
+        save_export_rows(export_file, lines, last_chunk)
+    return stats
 
 
-# 作用：獲取 Excel 表中所有測試數據
+# 作用：記錄保存導出文件時統計的行數（供 get_export_rows 使用，不用再次讀取文件）
+# 參數：export_file 導出文件名稱
+#       lines 換行符個數
+#       last_chunk 最後一塊數據
+def save_export_rows(export_file, lines, last_chunk):
+    # 最後一行沒有換行符時也算一行
+    if last_chunk and not last_chunk.endswith(b'\n'):
+        lines += 1
+    stat = os.stat(export_file)
+    export_rows[os.path.abspath(export_file)] = ((stat.st_size, stat.st_mtime), lines)
+
+
+# 作用：解析 req_file 中的上傳文件：多個文件以換行或「;」分隔，每個可寫為「字段名=文件路徑」（未寫字段名時為 file）
+# 參數：req_file Excel 中 req_file 單元格的值
+# 返回：[(字段名, 文件路徑)]（沒有文件時為 [('file', '')]，發送時拋出 FileNotFoundError）
+def get_upload_files(req_file):
+    files = []
+    for item in re.split(r'[;\n]', req_file or ''):
+        item = item.strip()
+        if item:
+            named = re.match(r'^(\w+)=(.+)$', item)
+            files.append((named.group(1), named.group(2).strip()) if named else ('file', item))
+    return files or [('file', '')]
+
+
+# 作用：獲取上傳文件的大小及修改時間（文件改變時需重新計算請求體長度）
+# 參數：files get_upload_files 返回的文件列表
+def get_files_signature(files):
+    signature = []
+    for name, path in files:
+        stat = os.stat(path)
+        signature.append((stat.st_size, stat.st_mtime))
+    return tuple(signature)
+
+
+# multipart/form-data 請求體：發送時逐塊讀取上傳文件，不在內存中生成整個請求體
+#   創建時計算一次請求體長度（Content-Length），重試時重新迭代即可再次發送；
+#   發送完記錄上傳耗時及字節數（階段 upload / upload_bytes）
+class MultipartEncoder(object):
+    chunk_size = 64 * 1024
+
+    # 參數：fields 其他表單字段 [(字段名, 值)]
+    #       files 上傳文件 [(字段名, 文件路徑)]
+    def __init__(self, fields, files):
+        self.boundary = os.urandom(16).hex()
+        self.content_type = 'multipart/form-data; boundary=%s' % (self.boundary,)
+        self.signature = get_files_signature(files)
+        # 各部分：(頭部, 字段值（文件為 None）, 文件路徑, 長度)
+        self.parts = []
+        for name, value in fields:
+            value = value.encode('utf-8')
+            self.parts.append((self.get_part_header(name), value, None, len(value)))
+        for (name, path), (size, mtime) in zip(files, self.signature):
+            content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            self.parts.append((self.get_part_header(name, os.path.basename(path), content_type), None, path, size))
+        self.closing = ('--%s--\r\n' % (self.boundary,)).encode('ascii')
+        self.length = sum(len(header) + size + 2 for header, value, path, size in self.parts) + len(self.closing)
+
+    # 作用：生成一個部分的頭部（字段名及文件名中的引號和換行按 HTML5 的方式轉義）
+    # 參數：name 字段名
+    #       filename 文件名（非文件字段為 None）
+    #       content_type 文件類型
+    def get_part_header(self, name, filename=None, content_type=None):
+        quote = lambda value: value.replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+        header = '--%s\r\nContent-Disposition: form-data; name="%s"' % (self.boundary, quote(name))
+        if filename is not None:
+            header = '%s; filename="%s"\r\nContent-Type: %s' % (header, quote(filename), content_type)
+        return ('%s\r\n\r\n' % (header,)).encode('utf-8')
+
+    def __len__(self):
+        return self.length
+
+    # 作用：逐塊生成請求體（requests 發送時使用）
+    def __iter__(self):
+        time_before = time.perf_counter()
+        for header, value, path, size in self.parts:
+            yield header
+            if path is None:
+                yield value
+            else:
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                        yield chunk
+                    self.check_size(f, path, size)
+            yield b'\r\n'
+        yield self.closing
+        add_phase('upload', time.perf_counter() - time_before)
+        add_phase('upload_bytes', self.length)
+
+    # 作用：逐塊異步生成請求體（aiohttp 發送時使用，讀取文件不阻塞事件循環）
+    async def iter_async(self):
+        loop = asyncio.get_running_loop()
+        time_before = time.perf_counter()
+        for header, value, path, size in self.parts:
+            yield header
+            if path is None:
+                yield value
+            else:
+                with open(path, 'rb') as f:
+                    while True:
+                        chunk = await loop.run_in_executor(None, f.read, self.chunk_size)
+                        if not chunk:
+                            break
+                        yield chunk
+                    self.check_size(f, path, size)
+            yield b'\r\n'
+        yield self.closing
+        add_phase('upload', time.perf_counter() - time_before)
+        add_phase('upload_bytes', self.length)
+
+    # 作用：檢查發送的文件長度與計算 Content-Length 時是否一致（發送過程中文件被修改時拋出 OSError）
+    # 參數：f 已讀取完的文件
+    #       path 文件路徑
+    #       size 計算 Content-Length 時的文件大小
+    def check_size(self, f, path, size):
+        if f.tell() != size:
+            raise OSError('上傳文件「%s」在發送過程中被修改' % (path,))
+
+
+# 上傳文件用例的 req_data（其他表單字段）不是字典時由 get_multipart_encoder 拋出，該用例執行失敗
+class UploadFieldsError(Exception):
+    pass
+
+
+# 作用：獲取上傳文件的 multipart 請求體：同一用例重試（或重複執行）且文件未改變時重用之前計算好長度的請求體
+# 參數：req_file Excel 中 req_file 單元格的值（見 get_upload_files）
+#       req_data 其他表單字段（字典，可為空）
+# 返回：MultipartEncoder；找不到上傳文件時拋出 FileNotFoundError，req_data 不是字典時拋出 UploadFieldsError
+def get_multipart_encoder(req_file, req_data):
+    if req_data and not isinstance(req_data, dict):
+        raise UploadFieldsError('上傳文件時 req_data 須為字典（其他表單字段），實際為 %s' % (type(req_data).__name__,))
+    files = get_upload_files(req_file)
+    fields = get_async_fields(req_data) if req_data else []
+    key = (req_file, tuple(fields))
+    encoder = upload_encoders.get(key)
+    if not encoder or encoder.signature != get_files_signature(files):
+        # 表單字段由表達式生成時每次可能不同，避免無限增長
+        if len(upload_encoders) >= 1000:
+            upload_encoders.clear()
+        encoder = upload_encoders[key] = MultipartEncoder(fields, files)
+    return encoder
+
+
+# 檢查點 / 請求數據表達式中可使用的函數
+expression_functions = {
+        'get_export_rows': get_export_rows,
+        'get_role_id': get_role_id,
+        'len': len,
+        'int': int,
+        'float': float,
+        'str': str,
+        }
+# 表達式中可使用的變量：r 接口響應；resp 接口返回數據（$ 為其簡寫）；res 其他接口返回數據；
+#                       basic_data 基礎數據；export_file 導出文件名稱；req_data 請求數據
+expression_names = ('r', 'resp', 'res', 'basic_data', 'export_file', 'req_data')
+# 非字典對象上可訪問的屬性（響應屬性及字符串、字典的常用方法）
+expression_attrs = frozenset(('status_code', 'text', 'content', 'headers', 'url', 'reason', 'ok', 'encoding', 'elapsed', 'total_seconds',
+                              'count', 'startswith', 'endswith', 'lower', 'upper', 'strip', 'split', 'get', 'keys', 'values', 'items'))
+expression_compare = {
+        ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+        ast.In: lambda a, b: a in b, ast.NotIn: lambda a, b: a not in b, ast.Is: operator.is_, ast.IsNot: operator.is_not,
+        }
+expression_binop = {
+        ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+        ast.FloorDiv: operator.floordiv, ast.Mod: operator.mod,
+        }
+expression_unaryop = {ast.Not: operator.not_, ast.USub: operator.neg, ast.UAdd: operator.pos}
+# 已編譯的表達式：表達式字符串 -> 可執行函數
+expression_cache = {}
+
+
+# 作用：把 JSON-path 風格的「$」替換為 resp（字符串裏的「$」不替換），如 $.data.total -> resp.data.total
+# 參數：source 表達式字符串
+def expand_json_path(source):
+    if '$' not in source:
+        return source
+    result = []
+    quote = None
+    i = 0
+    while i < len(source):
+        char = source[i]
+        if quote:
+            if char == '\\':
+                result.append(source[i:i + 2])
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char == '$':
+            char = 'resp'
+        result.append(char)
+        i += 1
+    return ''.join(result)
+
+
+# 作用：把表達式解析為受限的語法樹（只允許字面量、變量、取值、比較、邏輯 / 算術運算和指定函數調用）
+#       語法樹由元組組成，可保存到測試計劃緩存
+# 參數：source 表達式字符串
+# 返回：語法樹；不允許的語法拋出 SyntaxError，未知的變量或函數拋出 NameError
+def parse_expression(source):
+    tree = convert_expression(ast.parse(expand_json_path(source).strip(), mode='eval').body, source)
+    check_res_access(tree, source)
+    return tree
+
+
+# 作用：檢查表達式中 res 的用法：只能以常量取其他接口返回數據（res['api_id']、res.api_id、res.get('api_id', ...)），
+#       以便讀取用例時找出引用關係（見 get_expression_refs）；計算出的下標、res.keys() 等無法確定引用了哪個接口，拋出 SyntaxError
+# 參數：tree 語法樹（或語法樹中的元組）
+#       source 原表達式字符串（用於錯誤信息）
+def check_res_access(tree, source):
+    if tree == ('name', 'res'):
+        raise SyntaxError('res 只能以常量取值（res[\'api_id\'] / res.api_id / res.get(\'api_id\')）：%s' % (source,))
+    if tree[0] == 'index' and tree[1] == ('name', 'res') and tree[2][0] == 'const':
+        return
+    if tree[0] == 'attr' and tree[1] == ('name', 'res') and tree[2] not in ('get', 'keys', 'values', 'items'):
+        return
+    if tree[0] == 'call' and tree[1] == ('attr', ('name', 'res'), 'get') and tree[2] and tree[2][0][0] == 'const':
+        for item in tree[2][1:]:
+            check_res_access(item, source)
+        return
+    if tree[0] != 'const':
+        for item in tree:
+            if isinstance(item, tuple) and item:
+                check_res_access(item, source)
+
+
+# 作用：把 Python 語法樹節點轉為受限的語法樹（供 parse_expression 使用）
+# 參數：node Python 語法樹節點
+#       source 原表達式字符串（用於錯誤信息）
+def convert_expression(node, source):
+    if isinstance(node, ast.Constant):
+        return ('const', node.value)
+    if isinstance(node, ast.Name):
+        if node.id not in expression_names:
+            raise NameError('name \'%s\' is not defined' % (node.id,))
+        return ('name', node.id)
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return ('list' if isinstance(node, ast.List) else 'tuple', tuple(convert_expression(item, source) for item in node.elts))
+    if isinstance(node, ast.Dict) and None not in node.keys:
+        return ('dict', tuple((convert_expression(key, source), convert_expression(value, source)) for key, value in zip(node.keys, node.values)))
+    if isinstance(node, ast.Subscript) and not isinstance(node.slice, ast.Slice):
+        # Python 3.8 及之前的版本下標包在 ast.Index 中
+        index = node.slice.value if hasattr(ast, 'Index') and isinstance(node.slice, ast.Index) else node.slice
+        return ('index', convert_expression(node.value, source), convert_expression(index, source))
+    if isinstance(node, ast.Attribute) and not node.attr.startswith('_'):
+        return ('attr', convert_expression(node.value, source), node.attr)
+    if isinstance(node, ast.Call) and not node.keywords:
+        if isinstance(node.func, ast.Name):
+            if node.func.id not in expression_functions:
+                raise NameError('name \'%s\' is not defined' % (node.func.id,))
+            func = ('func', node.func.id)
+        elif isinstance(node.func, ast.Attribute) and node.func.attr in expression_attrs:
+            func = convert_expression(node.func, source)
+        else:
+            raise SyntaxError('不允許的函數調用：%s' % (source,))
+        if any(isinstance(arg, ast.Starred) for arg in node.args):
+            raise SyntaxError('不允許的函數調用：%s' % (source,))
+        return ('call', func, tuple(convert_expression(arg, source) for arg in node.args))
+    if isinstance(node, ast.Compare) and all(type(op) in expression_compare for op in node.ops):
+        return ('compare', convert_expression(node.left, source), tuple((type(op).__name__, convert_expression(item, source)) for op, item in zip(node.ops, node.comparators)))
+    if isinstance(node, ast.BoolOp):
+        return ('and' if isinstance(node.op, ast.And) else 'or', tuple(convert_expression(item, source) for item in node.values))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in expression_unaryop:
+        return ('unary', type(node.op).__name__, convert_expression(node.operand, source))
+    if isinstance(node, ast.BinOp) and type(node.op) in expression_binop:
+        return ('binop', type(node.op).__name__, convert_expression(node.left, source), convert_expression(node.right, source))
+    if isinstance(node, ast.IfExp):
+        return ('if', convert_expression(node.test, source), convert_expression(node.body, source), convert_expression(node.orelse, source))
+    raise SyntaxError('不允許的表達式「%s」：%s' % (type(node).__name__, source))
+
+
+# 作用：取屬性：字典按鍵取值（JSON-path 風格，如 resp.data.total）；其他對象只能取 expression_attrs 中的屬性
+# 參數：value 對象
+#       attr 屬性名稱
+def get_expression_attr(value, attr):
+    if isinstance(value, (dict, ResponseStore)):
+        if attr in value:
+            return value[attr]
+        if attr in ('get', 'keys', 'values', 'items'):
+            return getattr(value, attr)
+        raise KeyError(attr)
+    if attr in expression_attrs:
+        return getattr(value, attr)
+    raise AttributeError('不允許訪問屬性「%s」' % (attr,))
+
+
+# 作用：把受限的語法樹轉為可執行函數（只轉換一次，之後每次執行只是函數調用）
+# 參數：tree 語法樹（見 parse_expression）
+# 返回：函數 f(variables)，variables 為表達式中可使用的變量字典
+def build_expression(tree):
+    kind = tree[0]
+    if kind == 'const':
+        value = tree[1]
+        return lambda variables: value
+    if kind == 'name':
+        name = tree[1]
+        def get_name(variables):
+            try:
+                return variables[name]
+            except KeyError:
+                raise NameError('name \'%s\' is not defined' % (name,))
+        return get_name
+    if kind in ('list', 'tuple'):
+        items = [build_expression(item) for item in tree[1]]
+        if kind == 'list':
+            return lambda variables: [item(variables) for item in items]
+        return lambda variables: tuple(item(variables) for item in items)
+    if kind == 'dict':
+        items = [(build_expression(key), build_expression(value)) for key, value in tree[1]]
+        return lambda variables: dict((key(variables), value(variables)) for key, value in items)
+    if kind == 'index':
+        value, index = build_expression(tree[1]), build_expression(tree[2])
+        return lambda variables: value(variables)[index(variables)]
+    if kind == 'attr':
+        value, attr = build_expression(tree[1]), tree[2]
+        return lambda variables: get_expression_attr(value(variables), attr)
+    if kind == 'func':
+        func = expression_functions[tree[1]]
+        return lambda variables: func
+    if kind == 'call':
+        func, args = build_expression(tree[1]), [build_expression(arg) for arg in tree[2]]
+        return lambda variables: func(variables)(*[arg(variables) for arg in args])
+    if kind == 'compare':
+        left = build_expression(tree[1])
+        comparators = [(expression_compare[getattr(ast, op)], build_expression(item)) for op, item in tree[2]]
+        def compare(variables):
+            a = left(variables)
+            for op, item in comparators:
+                b = item(variables)
+                if not op(a, b):
+                    return False
+                a = b
+            return True
+        return compare
+    if kind in ('and', 'or'):
+        items = [build_expression(item) for item in tree[1]]
+        def bool_op(variables):
+            for item in items:
+                value = item(variables)
+                if (kind == 'and') != bool(value):
+                    return value
+            return value
+        return bool_op
+    if kind == 'unary':
+        op, operand = expression_unaryop[getattr(ast, tree[1])], build_expression(tree[2])
+        return lambda variables: op(operand(variables))
+    if kind == 'binop':
+        op, left, right = expression_binop[getattr(ast, tree[1])], build_expression(tree[2]), build_expression(tree[3])
+        return lambda variables: op(left(variables), right(variables))
+    if kind == 'if':
+        test, body, orelse = build_expression(tree[1]), build_expression(tree[2]), build_expression(tree[3])
+        return lambda variables: body(variables) if test(variables) else orelse(variables)
+    raise SyntaxError('不允許的表達式：%s' % (kind,))
+
+
+# 作用：編譯表達式（同一表達式只編譯一次）
+# 參數：source 表達式字符串
+# 返回：同 build_expression；表達式有誤時拋出 SyntaxError / NameError
+def compile_expression(source):
+    func = expression_cache.get(source)
+    if not func:
+        func = expression_cache[source] = build_expression(parse_expression(source))
+    return func
+
+
+# 作用：找出語法樹中引用到的其他接口返回數據（res['api_id']、res.api_id 或 res.get('api_id', ...)，見 check_res_access）
+# 參數：tree 語法樹（或語法樹中的元組）
+# 返回：被引用的 api_id 集合
+def get_expression_refs(tree):
+    refs = set()
+    if tree[0] == 'index' and tree[1] == ('name', 'res') and tree[2][0] == 'const':
+        refs.add(tree[2][1])
+    elif tree[0] == 'call' and tree[1] == ('attr', ('name', 'res'), 'get') and tree[2] and tree[2][0][0] == 'const':
+        refs.add(tree[2][0][1])
+        for item in tree[2][1:]:
+            refs.update(get_expression_refs(item))
+        return refs
+    elif tree[0] == 'attr' and tree[1] == ('name', 'res'):
+        refs.add(tree[2])
+    if tree[0] != 'const':
+        for item in tree:
+            if isinstance(item, tuple) and item:
+                refs.update(get_expression_refs(item))
+    return refs
+
+
+# 當前線程（異步執行時為當前協程）正在執行的用例各階段耗時（秒）
+phase_var = contextvars.ContextVar('phases', default=None)
+
+
+# 作用：開始記錄當前線程 / 協程新用例的各階段耗時
+# 返回：各階段耗時字典 {階段名稱: 秒}
+def start_phases():
+    phases = {}
+    phase_var.set(phases)
+    return phases
+
+
+# 作用：累計當前線程 / 協程用例某一階段的耗時（未開始記錄時忽略）
+# 參數：name 階段名稱（見 phase_names）
+#       seconds 耗時（秒）
+def add_phase(name, seconds):
+    phases = phase_var.get()
+    if phases is not None:
+        phases[name] = phases.get(name, 0) + seconds
+
+
+# 作用：獲取當前線程 / 協程用例某一階段已累計的耗時
+def get_phase(name):
+    return (phase_var.get() or {}).get(name, 0)
+
+
+# 作用：獲取發送請求期間會與首字節耗時重疊的階段（建立連接、上傳、使用 HTTP 緩存時讀取返回數據）的累計耗時
+#       請求前後的差即為需要從首字節耗時中扣除的部分
+def get_request_phases():
+    return get_phase('connect') + get_phase('upload') + get_phase('download')
+
+
+# urllib3 連接類：記錄建立連接（TCP / TLS 握手）的耗時
+class TimedHTTPConnection(urllib3.connection.HTTPConnection):
+    def connect(self):
+        time_before = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_phase('connect', time.perf_counter() - time_before)
+
+
+class TimedHTTPSConnection(urllib3.connection.HTTPSConnection):
+    def connect(self):
+        time_before = time.perf_counter()
+        try:
+            super().connect()
+        finally:
+            add_phase('connect', time.perf_counter() - time_before)
+
+
+class TimedHTTPConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+# requests 適配器：使用可記錄連接耗時的連接池
+class TimedHTTPAdapter(requests.adapters.HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+
+# Http2Adapter 響應的 raw：響應內容已一次讀取完，按 urllib3 響應的接口從內存中讀取
+#   requests 從 _original_response.msg 讀取 Set-Cookie，以便登入後保持同一會話
+class Http2RawResponse(io.BytesIO):
+    def __init__(self, content, msg):
+        super().__init__(content)
+        self._original_response = types.SimpleNamespace(msg=msg)
+
+    def stream(self, amt=64 * 1024, decode_content=None):
+        while True:
+            chunk = self.read(amt)
+            if not chunk:
+                break
+            yield chunk
+
+    def release_conn(self):
+        pass
+
+
+# requests 適配器：通過 httpx 使用 HTTP/2 發送請求（只對 https 生效，http 仍為 HTTP/1.1）
+#   響應內容一次讀取完，下載耗時計入首字節耗時
+class Http2Adapter(requests.adapters.BaseAdapter):
+    def __init__(self, pool_maxsize=requests.adapters.DEFAULT_POOLSIZE):
+        super().__init__()
+        self.client = httpx.Client(http2=True, limits=httpx.Limits(max_connections=pool_maxsize, max_keepalive_connections=pool_maxsize))
+        self.num_requests = 0
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        self.num_requests += 1
+        try:
+            resp = self.client.request(request.method, request.url, headers=request.headers, content=request.body, timeout=timeout)
+        except httpx.ConnectError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e, request=request)
+        except httpx.HTTPError as e:
+            raise requests.exceptions.RequestException(e, request=request)
+
+        response = requests.Response()
+        response.status_code = resp.status_code
+        response.reason = resp.reason_phrase
+        response.headers = requests.structures.CaseInsensitiveDict(resp.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = resp.content
+        # iter_content 直接使用已讀取的內容（如保存導出文件），不再從 raw 讀取
+        response._content_consumed = True
+        msg = http.client.HTTPMessage()
+        for name, value in resp.headers.multi_items():
+            msg[name] = value
+        response.raw = Http2RawResponse(resp.content, msg)
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+# 可選的傳輸方式（「Basic Data」中 http_transport 設置，默認 http1）
+transports = {
+        'http1': TimedHTTPAdapter,
+        'http2': Http2Adapter,
+        }
+
+
+# 作用：獲取最大並發數（「Basic Data」中 max_workers，默認 1）
+# 參數：basic_data Excel 中基礎數據
+def get_max_workers(basic_data):
+    try:
+        return max(int(basic_data.get('max_workers') or 1), 1)
+    except ValueError:
+        logging.error('「max_workers」參數不正確，改為逐條執行')
+        return 1
+
+
+# 會話池：每個 api_host 使用一個會話（保持長連接），所有會話共用同一 Cookie（登入狀態）
+#   「Basic Data」中設置：pool_maxsize 每個主機最多保持的連接數（默認為 max_workers 與 10 中較大值）；
+#                         http_transport 傳輸方式 http1 / http2
+#   http_cache 為 get 請求使用的 HTTP 緩存（見 HttpCache，不使用時為 None）
+class SessionPool(object):
+    def __init__(self, basic_data, http_cache=None):
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.http_cache = http_cache
+        self.cookies = requests.cookies.RequestsCookieJar()
+        try:
+            self.pool_maxsize = int(basic_data.get('pool_maxsize') or max(get_max_workers(basic_data), 10))
+        except ValueError:
+            logging.error('「pool_maxsize」參數不正確，使用默認值')
+            self.pool_maxsize = max(get_max_workers(basic_data), 10)
+        self.transport = basic_data.get('http_transport') or 'http1'
+        if self.transport not in transports:
+            logging.error('「http_transport」參數不正確，使用 http1')
+            self.transport = 'http1'
+        elif self.transport == 'http2' and not httpx:
+            logging.error('使用 HTTP/2 需要安裝第三方庫 httpx[http2]，改為使用 http1')
+            self.transport = 'http1'
+
+    # 作用：獲取主機對應的會話（不存在時創建）
+    # 參數：api_host 服務器主機
+    def get_session(self, api_host):
+        with self.lock:
+            s = self.sessions.get(api_host)
+            if not s:
+                s = requests.Session()
+                s.headers.update(default_headers)
+                s.cookies = self.cookies
+                adapter = transports[self.transport](pool_maxsize=self.pool_maxsize)
+                s.mount('http://', adapter)
+                s.mount('https://', adapter)
+                self.sessions[api_host] = s
+            return s
+
+    # 作用：獲取各主機連接池使用情況
+    # 返回：[{'host', 'requests', 'connections', 'idle', 'maxsize'}]（HTTP/2 時新建連接數未知，為 None）
+    def get_stats(self):
+        stats = []
+        with self.lock:
+            for api_host, s in sorted(self.sessions.items()):
+                adapter = s.get_adapter('http://')
+                if isinstance(adapter, Http2Adapter):
+                    stats.append({'host': api_host, 'requests': adapter.num_requests, 'connections': None, 'idle': None, 'maxsize': self.pool_maxsize})
+                    continue
+                item = {'host': api_host, 'requests': 0, 'connections': 0, 'idle': 0, 'maxsize': self.pool_maxsize}
+                for key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools[key]
+                    item['requests'] += pool.num_requests
+                    item['connections'] += pool.num_connections
+                    # 連接池隊列中未建立的連接以 None 佔位
+                    item['idle'] += sum(1 for conn in list(pool.pool.queue) if conn) if pool.pool else 0
+                stats.append(item)
+        return stats
+
+    def close(self):
+        for s in self.sessions.values():
+            s.close()
+
+
+# 作用：把連接池使用情況轉為文字，如「host : 請求 12 / 新建連接 2 / 復用率 83%」
+# 參數：item SessionPool.get_stats 返回的一項
+def format_pool_stats(item):
+    if item['connections'] is None:
+        return '%s : 請求 %d（HTTP/2，最大連接數 %d）' % (item['host'], item['requests'], item['maxsize'])
+    reuse = (item['requests'] - item['connections']) * 100.0 / item['requests'] if item['requests'] else 0
+    # 異步執行時空閒連接數未知，為 None
+    if item['idle'] is None:
+        return '%s : 請求 %d / 新建連接 %d / 最大連接數 %d / 復用率 %.0f%%' % (item['host'], item['requests'], item['connections'], item['maxsize'], reuse)
+    return '%s : 請求 %d / 新建連接 %d / 空閒連接 %d / 最大連接數 %d / 復用率 %.0f%%' % (item['host'], item['requests'], item['connections'], item['idle'], item['maxsize'], reuse)
+
+
+# 作用：按響應頭 Cache-Control 計算緩存的過期時間（max-age 減去 Age；no-cache 或沒有 max-age 時每次都需要條件請求）
+# 參數：headers 響應頭（不區分大小寫）
+# 返回：過期時間（時間戳），0 表示已過期
+def get_cache_expires(headers):
+    cache_control = (headers.get('Cache-Control') or '').lower()
+    max_age = re.search(r'(?:^|,)\s*max-age\s*=\s*(\d+)', cache_control)
+    if 'no-cache' in cache_control or not max_age:
+        return 0
+    age = headers.get('Age') or '0'
+    return time.time() + int(max_age.group(1)) - (int(age) if age.isdigit() else 0)
+
+
+# HTTP 緩存：「Basic Data」中 http_cache 設置為 1 時用於 get 請求（導出文件的用例及用例中 http_cache 列填 0 的除外）
+#   緩存未過期（Cache-Control: max-age）時不發送請求；否則帶上 If-None-Match / If-Modified-Since 發送條件請求，返回 304 時使用緩存
+#   同一次執行中相同的請求（URL 及參數相同）正在執行時等待其結果，不重複發送
+#   返回數據保存在 http_cache_dir（默認 log/http_cache），總大小超過 http_cache_mb（默認 100 MB）時刪除最久未使用的
+#   只保存狀態碼 200、有 ETag / Last-Modified / max-age 且沒有 no-store 的響應
+class HttpCache(object):
+    def __init__(self, basic_data):
+        self.lock = threading.Lock()
+        self.cache_dir = basic_data.get('http_cache_dir') or os.path.join(os.getcwd(), 'log/http_cache')
+        try:
+            self.max_size = float(basic_data.get('http_cache_mb') or 100) * 1048576
+        except ValueError:
+            logging.error('「http_cache_mb」參數不正確，使用默認值 100 MB')
+            self.max_size = 100 * 1048576
+        self.index_file = os.path.join(self.cache_dir, 'index.json')
+        self.index = self.load_index()  # 緩存鍵 -> {'url', 'status', 'reason', 'headers', 'expires', 'size', 'used'}
+        self.removed = set()            # 本次執行中刪除的緩存（保存索引時不再從文件合併回來）
+        self.inflight = {}              # 緩存鍵 -> 正在執行的請求結果（concurrent.futures.Future，見 finish）
+        self.stats = {'hits': 0, 'revalidated': 0, 'shared': 0, 'misses': 0, 'stored': 0, 'evicted': 0}
+
+    # 作用：讀取緩存索引（不存在或已損壞時返回空字典）
+    def load_index(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    # 作用：計算請求的緩存鍵
+    # 參數：url 接口地址
+    #       req_data 請求參數
+    def get_key(self, url, req_data):
+        return hashlib.sha1(json.dumps([url, req_data or {}], sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    # 作用：讀取緩存的返回數據（文件已被刪除時返回 None）
+    # 參數：key 緩存鍵
+    def read(self, key):
+        try:
+            with open(os.path.join(self.cache_dir, key), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    # 作用：查找緩存
+    # 參數：key 緩存鍵
+    # 返回：(響應, 正在執行的相同請求, 已過期的緩存)：緩存未過期時返回響應（見 CachedResponse）；
+    #       相同的請求正在執行時返回其 Future；都沒有時本次請求負責發送（發送後須調用 finish），
+    #       有已過期的緩存時返回 (緩存信息, 返回數據) 用於條件請求
+    def lookup(self, key):
+        with self.lock:
+            future = self.inflight.get(key)
+            if future:
+                return None, future, None
+            entry = self.index.get(key)
+            content = self.read(key) if entry else None
+            if entry and content is None:
+                self.remove(key)
+                entry = None
+            if entry and entry['expires'] > time.time():
+                entry['used'] = time.time()
+                self.stats['hits'] += 1
+                return CachedResponse(entry, content, 0), None, None
+            self.inflight[key] = concurrent.futures.Future()
+            return None, None, (entry, content) if entry else None
+
+    # 作用：獲取條件請求頭（If-None-Match / If-Modified-Since）
+    # 參數：stale lookup 返回的已過期緩存
+    def get_conditional_headers(self, stale):
+        if not stale:
+            return {}
+        headers = requests.structures.CaseInsensitiveDict(stale[0]['headers'])
+        conditional = {}
+        if headers.get('ETag'):
+            conditional['If-None-Match'] = headers['ETag']
+        if headers.get('Last-Modified'):
+            conditional['If-Modified-Since'] = headers['Last-Modified']
+        return conditional
+
+    # 作用：本次請求執行完後更新緩存，並把結果交給等待中的相同請求
+    # 參數：key 緩存鍵
+    #       r 已讀取返回數據的響應（requests 響應或 AsyncResponse）；None 表示請求失敗，等待中的請求改為各自發送
+    #       stale lookup 返回的已過期緩存
+    # 返回：需使用的響應（304 時為緩存中的響應）
+    def finish(self, key, r, stale=None):
+        shared = None
+        with self.lock:
+            future = self.inflight.pop(key, None)
+            if r is not None and r.status_code == 304 and stale:
+                entry, content = stale
+                headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+                for name in ('ETag', 'Last-Modified', 'Cache-Control', 'Expires', 'Date'):
+                    if r.headers.get(name):
+                        headers[name] = r.headers[name]
+                entry.update({'headers': dict(headers), 'expires': get_cache_expires(headers), 'used': time.time()})
+                self.stats['revalidated'] += 1
+                r = CachedResponse(entry, content, r.elapsed.total_seconds())
+                shared = (entry, content)
+            elif r is not None:
+                self.stats['misses'] += 1
+                content = r.content
+                entry = {'url': r.url, 'status': r.status_code, 'reason': r.reason, 'headers': dict(r.headers),
+                         'expires': get_cache_expires(r.headers), 'size': len(content), 'used': time.time()}
+                shared = (entry, content)
+                if r.status_code == 200 and 'no-store' not in (r.headers.get('Cache-Control') or '').lower() and entry['size'] <= self.max_size \
+                        and (r.headers.get('ETag') or r.headers.get('Last-Modified') or entry['expires']):
+                    self.store(key, entry, content)
+        if future:
+            future.set_result(shared)
+        return r
+
+    # 作用：使用相同請求的執行結果
+    # 參數：shared 相同請求的 Future 結果（見 finish）
+    # 返回：響應；相同請求執行失敗時返回 None
+    def get_shared(self, shared):
+        if not shared:
+            return None
+        with self.lock:
+            self.stats['shared'] += 1
+        return CachedResponse(shared[0], shared[1], 0)
+
+    # 作用：保存返回數據到緩存目錄，總大小超過上限時刪除最久未使用的緩存
+    # 參數：key 緩存鍵
+    #       entry 緩存信息
+    #       content 返回數據
+    def store(self, key, entry, content):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = os.path.join(self.cache_dir, key)
+        with open('%s.tmp' % (path,), 'wb') as f:
+            f.write(content)
+        os.replace('%s.tmp' % (path,), path)
+        self.index[key] = entry
+        self.removed.discard(key)
+        self.stats['stored'] += 1
+        self.evict()
+
+    # 作用：總大小超過上限時按最近使用時間刪除緩存（正在執行的請求的緩存除外）
+    def evict(self):
+        total = sum(entry['size'] for entry in self.index.values())
+        for key in sorted(self.index, key=lambda key: self.index[key]['used']):
+            if total <= self.max_size:
+                break
+            if key in self.inflight:
+                continue
+            total -= self.index[key]['size']
+            self.remove(key)
+            self.stats['evicted'] += 1
+
+    # 作用：刪除一條緩存
+    # 參數：key 緩存鍵
+    def remove(self, key):
+        self.index.pop(key, None)
+        self.removed.add(key)
+        try:
+            os.remove(os.path.join(self.cache_dir, key))
+        except OSError:
+            pass
+
+    # 作用：發送 get 請求並讀取返回數據
+    # 參數：s requests 會話
+    #       url / req_data / headers / timeout 同 run_api
+    def send(self, s, url, req_data, headers, timeout):
+        r = s.get(url, params=req_data or None, headers=headers, timeout=timeout, stream=True)
+        time_before = time.perf_counter()
+        r.content
+        add_phase('download', time.perf_counter() - time_before)
+        return r
+
+    # 作用：使用緩存發送 get 請求（見 run_api）
+    # 參數：同 send
+    # 返回：已讀取返回數據的響應（requests 響應或 CachedResponse）
+    def get(self, s, url, req_data, headers, timeout):
+        key = self.get_key(url, req_data)
+        r, future, stale = self.lookup(key)
+        if future:
+            r = self.get_shared(future.result())
+        if r:
+            return r
+        # 相同的請求執行失敗時各自發送（不使用緩存）
+        if future:
+            return self.send(s, url, req_data, headers, timeout)
+        try:
+            r = self.send(s, url, req_data, dict(headers, **self.get_conditional_headers(stale)), timeout)
+        except BaseException:
+            self.finish(key, None)
+            raise
+        return self.finish(key, r, stale)
+
+    # 作用：異步發送 get 請求並讀取返回數據
+    # 參數：session aiohttp 會話
+    #       url / req_data / headers 同 run_api_async
+    async def send_async(self, session, url, req_data, headers):
+        time_request = time.perf_counter()
+        async with session.get(url, params=get_async_fields(req_data) if req_data else None, headers=headers) as response:
+            time_before = time.perf_counter()
+            content = await response.read()
+            add_phase('download', time.perf_counter() - time_before)
+        return AsyncResponse(response, content, time.perf_counter() - time_request)
+
+    # 作用：使用緩存異步發送 get 請求（見 run_api_async）
+    # 參數：同 send_async
+    # 返回：已讀取返回數據的響應（AsyncResponse 或 CachedResponse）
+    async def get_async(self, session, url, req_data, headers):
+        key = self.get_key(url, req_data)
+        r, future, stale = self.lookup(key)
+        if future:
+            r = self.get_shared(await asyncio.wrap_future(future))
+        if r:
+            return r
+        if future:
+            return await self.send_async(session, url, req_data, headers)
+        try:
+            r = await self.send_async(session, url, req_data, dict(headers, **self.get_conditional_headers(stale)))
+        except BaseException:
+            self.finish(key, None)
+            raise
+        return self.finish(key, r, stale)
+
+    # 作用：保存緩存索引（與其他進程同時保存的索引合併，相同的緩存保留最近使用的）
+    def close(self):
+        with self.lock:
+            if not any(self.stats.values()):
+                return
+            index = self.load_index()
+            for key in self.removed:
+                index.pop(key, None)
+            for key, entry in self.index.items():
+                if key not in index or index[key]['used'] <= entry['used']:
+                    index[key] = entry
+            self.index = index
+            self.evict()
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open('%s.tmp' % (self.index_file,), 'w', encoding='utf-8') as f:
+                json.dump(self.index, f)
+            os.replace('%s.tmp' % (self.index_file,), self.index_file)
+
+
+# 作用：獲取 HTTP 緩存（「Basic Data」中 http_cache 未設置或為 0 時不使用，返回 None）
+# 參數：basic_data Excel 中基礎數據
+def get_http_cache(basic_data):
+    if str(basic_data.get('http_cache') or 0).strip() == '0':
+        return None
+    return HttpCache(basic_data)
+
+
+# 作用：判斷用例是否使用 HTTP 緩存（用例中 http_cache 列填 0 時不使用）
+# 參數：test_case 單條測試用例
+def use_http_cache(test_case):
+    return str(test_case.get('http_cache')).strip() != '0'
+
+
+# 作用：把 HTTP 緩存統計轉為文字，如「命中 8（未過期 5 / 304 2 / 合併請求 1）/ 未命中 4 / 命中率 67%」
+# 參數：stats HttpCache.stats
+def format_cache_stats(stats):
+    hits = stats['hits'] + stats['revalidated'] + stats['shared']
+    total = hits + stats['misses']
+    return '命中 %d（未過期 %d / 304 %d / 合併請求 %d）/ 未命中 %d / 命中率 %.0f%% / 保存 %d / 刪除 %d' % (
+            hits, stats['hits'], stats['revalidated'], stats['shared'], stats['misses'], hits * 100.0 / total if total else 0, stats['stored'], stats['evicted'])
+
+
+# 用例連接異常且還可重試時由 run_api 拋出：調度器等待 delay 秒後重新執行該用例，等待期間其他用例照常執行
+class RetryCase(Exception):
+    def __init__(self, delay, attempt):
+        super().__init__(delay, attempt)
+        self.delay = delay          # 重試前等待時間（秒）
+        self.attempt = attempt      # 本次是第幾次嘗試
+        self.time_spend = 0         # 本次嘗試耗時（秒，由 run_test_case 填寫）
+        self.phases = {}            # 本次嘗試各階段耗時
+
+
+# 作用：獲取用例的重試策略：用例中 retry_times / retry_backoff 列優先，未填寫時使用「Basic Data」中同名設置
+#       retry_times 連接異常時最多嘗試次數（默認 3）；retry_backoff 第一次重試前等待時間（秒，默認 1，之後每次加倍）；
+#       retry_max_wait 每次等待時間上限（秒，默認 10，只在「Basic Data」中設置）
+# 參數：test_case 單條測試用例
+#       basic_data Excel 中基礎數據
+# 返回：{'times', 'backoff', 'max_wait'}
+def get_retry_policy(test_case, basic_data):
+    policy = {'times': 3, 'backoff': 1.0, 'max_wait': 10.0}
+    for key, name, cast in (('times', 'retry_times', int), ('backoff', 'retry_backoff', float), ('max_wait', 'retry_max_wait', float)):
+        for value in (test_case.get(name), basic_data.get(name)):
+            if value is None or value == '':
+                continue
+            try:
+                policy[key] = cast(value)
+                break
+            except ValueError:
+                logging.error('API: %s >> 「%s」參數不正確 - %s' % (test_case['api_title'], name, value))
+    policy['times'] = max(policy['times'], 1)
+    return policy
+
+
+# 作用：計算第 attempt 次失敗後的等待時間：指數退避（backoff * 2^(attempt-1)，不超過 max_wait），
+#       再隨機取其一半到全部，避免多個用例同時重試
+# 參數：policy 重試策略（見 get_retry_policy）
+#       attempt 已失敗的次數
+def get_retry_delay(policy, attempt):
+    delay = min(policy['backoff'] * 2 ** (attempt - 1), policy['max_wait'])
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# 作用：找出 req_data / check_point 中引用到的其他接口返回數據（res['api_id'] 或 res.api_id）
+# 參數：test_case 單條測試用例
+# 返回：被引用的 api_id 集合
+def get_case_refs(test_case):
+    refs = set()
+    for key in ('req_data', 'check_point'):
+        if test_case.get('%s_tree' % (key,)):
+            refs.update(get_expression_refs(test_case['%s_tree' % (key,)]))
+        # 表達式有誤未能編譯時按字符串查找
+        elif isinstance(test_case[key], str):
+            refs.update(re.findall(r'res\[\s*[\'"]([^\'"]+)[\'"]\s*\]', test_case[key]))
+    return refs
+
+
+# 作用：判斷是否為登入用例
+# 參數：test_case 單條測試用例
+def is_login_case(test_case):
+    return bool(re.match(r'^.*/user/login$', test_case['api_url']))
+
+
+# 作用：執行單條測試用例（登入用例除外）
+# 參數：test_case 單條測試用例
+#       res 接口返回數據
+#       sessions 會話池（見 SessionPool）
+#       basic_data Excel 中基礎數據（req_data 中可能會用到）
+#       attempt 第幾次嘗試（連接異常還可重試時拋出 RetryCase）
+# 返回：該用例的失敗信息（列表，每項為一次失敗的詳情；執行成功時為空列表）和執行時間紀錄（未執行接口時為 None）
+def run_test_case(test_case, res, sessions, basic_data, attempt=1):
+    # 執行失敗的信息，每項為一次失敗的詳情（每行一條），由報告輸出
+    failures = []
+    is_ready, req_data = get_req_data(test_case, res, basic_data, failures)
+    if not is_ready:
+        return failures, None
+
+    # 執行接口測試，把接口返回值保存在 res 字典中
+    # 使用單調時鐘記錄總耗時，run_api 中記錄各階段耗時
+    s = sessions.get_session(test_case['api_host'])
+    retry_policy = get_retry_policy(test_case, basic_data)
+    phases = start_phases()
+    time_before = time.perf_counter()
+    try:
+        resp = run_api(test_case['req_file'], res, s, test_case['api_url'], test_case['req_method'], test_case['req_data_type'], req_data, test_case['api_title'], test_case['check_point'], failures, test_case.get('check_point_code'), retry_policy, attempt,
+                       sessions.http_cache if use_http_cache(test_case) else None)
+        save_response(res, test_case['api_id'], resp, phases.get('response_bytes', 0))
+    except RetryCase as e:
+        e.time_spend = time.perf_counter() - time_before
+        e.phases = phases
+        raise
+    time_spend = time.perf_counter() - time_before
+    return failures, {'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'time_spend': time_spend, 'phases': phases}
+
+
+# 作用：計算用例的請求數據並檢查 check_point（run_test_case / run_test_case_async 共用）
+# 參數：test_case / res / basic_data 同 run_test_case
+#       failures 用例的失敗信息列表
+# 返回：是否可以執行接口及請求數據
+def get_req_data(test_case, res, basic_data, failures):
+    # req_data 接口請求數據不為 None 時，把數據轉為字典
+    if test_case['req_data']:
+        try:
+            # 通過表達式引擎將 excel 表裏的參數轉為正確的值（不再使用 eval）
+            #     已預先編譯時直接執行編譯結果（見 compile_test_case）
+            req_data = (test_case.get('req_data_code') or compile_expression(test_case['req_data']))({'res': res, 'basic_data': basic_data})
+        except (NameError, KeyError, SyntaxError, AttributeError, TypeError, IndexError, ValueError, ZeroDivisionError) as e:
+            logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (test_case['api_title'], type(e), e.args))
+            failures.append(['URL: %s' % (test_case['api_url'],), '異常：%s %s' % (type(e), e.args)])
+            return False, None
+
+        if not isinstance(req_data, dict):
+            logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_data」要求為字典類型 - %s' % (test_case['api_title'], req_data))
+            failures.append(['URL: %s' % (test_case['api_url'],), '原因：「req_data」要求為字典類型 - %s' % (req_data,)])
+    else:
+        req_data = ''
+
+    # check_point 檢查點為 None 時該用例不再執行
+    if not test_case['check_point']:
+        logging.error('API: %s >> 執行失敗 >> 「check_point」不可為空' % (test_case['api_title'],))
+        failures.append(['URL: %s' % (test_case['api_url'],), '「check_point」不可為空'])
+        return False, None
+    return True, req_data
+
+
+# 作用：執行單條測試用例，連接異常時在當前線程等待後重試（用於無其他用例可執行時，如登入、壓力測試的準備階段）
+# 參數：test_case / res / sessions / basic_data 同 run_test_case
+#       report 報告（可選，重試時發送等待重試及重新開始執行的事件，第一次開始執行的事件由調用者發送）
+#       index 用例序號（用於事件）
+#       tries 事件中的嘗試次數 {'attempt': 已開始的嘗試次數}（多次登入時由 run_login_case 共用，事件中的次數連續）
+# 返回：同 run_test_case
+def run_test_case_with_retry(test_case, res, sessions, basic_data, report=None, index=None, tries=None):
+    tries = tries if tries is not None else {'attempt': 1}
+    attempt = 1
+    retry_time = 0
+    while True:
+        try:
+            failures, time_item = run_test_case(test_case, res, sessions, basic_data, attempt)
+        except RetryCase as e:
+            retry_time += e.time_spend + e.delay
+            if report:
+                emit_retry(report, index, test_case, tries['attempt'], e.delay)
+            time.sleep(e.delay)
+            attempt += 1
+            tries['attempt'] += 1
+            if report:
+                emit_start(report, index, test_case, tries['attempt'])
+            continue
+        if time_item and retry_time:
+            time_item['time_spend'] += retry_time
+            time_item['phases']['retry_wait'] = time_item['phases'].get('retry_wait', 0) + retry_time
+        return failures, time_item
+
+
+# 作用：判斷登入是否成功：登入接口返回數據滿足「Basic Data」中 login_check 表達式（默認 resp.msg == 'success'）
+# 參數：resp 登入接口返回數據
+#       basic_data Excel 中基礎數據
+def is_login_success(resp, basic_data):
+    try:
+        return bool(compile_expression(basic_data.get('login_check') or "resp.msg == 'success'")({'resp': resp, 'basic_data': basic_data}))
+    except (NameError, KeyError, SyntaxError, AttributeError, TypeError, IndexError, ValueError) as e:
+        logging.debug('登入檢查不通過 >> 異常：%s %s' % (type(e), e.args))
+        return False
+
+
+# 作用：獲取登入失敗後的重試策略（見 run_login_case）
+# 參數：test_case / basic_data 同 run_test_case
+def get_login_policy(test_case, basic_data):
+    # 设置重新登录前等待时间
+    login_policy = get_retry_policy(test_case, basic_data)
+    try:
+        login_policy['backoff'] = float(basic_data.get('login_retry_wait') or 30)
+        login_policy['max_wait'] = max(login_policy['max_wait'], login_policy['backoff'])
+    except ValueError:
+        logging.error('「login_retry_wait」參數不正確，使用默認值 30 秒')
+        login_policy['backoff'] = login_policy['max_wait'] = 30.0
+    return login_policy
+
+
+# 作用：執行登入用例，無法登入時進行多次嘗試
+#       每次失敗後等待「Basic Data」中 login_retry_wait 秒（默認 30，之後每次加倍，不超過 retry_max_wait 與其中較大值）
+# 參數：同 run_test_case_with_retry
+# 返回：該用例的失敗信息、執行時間紀錄以及是否登入成功
+def run_login_case(test_case, res, sessions, basic_data, report=None, index=None):
+    login_policy = get_login_policy(test_case, basic_data)
+    tries = {'attempt': 1}
+    # 嘗試 3 次登入（由於業務要求第 4 次起需要驗證碼，無法再次嘗試）
+    for count in range(1, 4):
+        # 多次登录后，只记录一次登录接口执行时间
+        failures, time_item = run_test_case_with_retry(test_case, res, sessions, basic_data, report, index, tries)
+        # 用例數據有誤未能執行接口時，與普通用例一樣只記錄錯誤
+        if not time_item:
+            return failures, time_item, True
+
+        if is_login_success(res[test_case['api_id']], basic_data):
+            # 如果登入成功而非第一次執行登入接口，則把之前登入失敗的紀錄清除
+            if count != 1:
+                failures = []
+            return failures, time_item, True
+        else:
+            # 儲存第一次登入失敗的信息，多次嘗試後還是失敗時只保留這個紀錄
+            if count == 1:
+                temp_failures = failures
+            if count == 3:
+                break
+            # 每次失敗後等待一定時間（秒）後再嘗試（登入為屏障，此時沒有其他用例可執行）
+            retry_time = get_retry_delay(login_policy, count)
+            logging.error('API: %s >> 执行失败 >>\n>> 登录失败，%.1f 秒后重试' % (test_case['api_title'], retry_time))
+            if report:
+                emit_retry(report, index, test_case, tries['attempt'], retry_time)
+            time.sleep(retry_time)
+            tries['attempt'] += 1
+            if report:
+                emit_start(report, index, test_case, tries['attempt'])
+    return temp_failures, time_item, False
+
+
+# 接口返回數據存儲（代替 res 字典）：只保留之後的用例會引用到的返回數據
+#   讀取用例時登記引用關係（add_consumers），引用它的最後一條用例執行完後即刪除（release）；
+#   所有用例讀取完後（seal）沒有用例引用的返回數據不再保存
+#   超過「Basic Data」中 res_spill_kb（默認 512 KB）的返回數據保存到臨時文件，讀取時再載入
+class ResponseStore(collections.abc.MutableMapping):
+    def __init__(self, basic_data):
+        self.lock = threading.RLock()
+        self.data = {}          # api_id -> 返回數據
+        self.spilled = {}       # api_id -> 臨時文件路徑
+        self.consumers = {}     # api_id -> 還未執行完的引用它的用例數
+        self.sealed = False
+        self.spill_dir = None
+        self.stats = {'stored': 0, 'dropped': 0, 'spilled': 0, 'peak': 0}
+        try:
+            self.spill_size = float(basic_data.get('res_spill_kb') or 512) * 1024
+        except ValueError:
+            logging.error('「res_spill_kb」參數不正確，使用默認值 512 KB')
+            self.spill_size = 512 * 1024
+
+    def __getitem__(self, api_id):
+        with self.lock:
+            if api_id in self.data:
+                return self.data[api_id]
+            path = self.spilled[api_id]
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def __setitem__(self, api_id, value):
+        self.store(api_id, value)
+
+    # 作用：保存返回數據，超過 res_spill_kb 時寫入臨時文件
+    # 參數：api_id 接口 ID
+    #       value 返回數據
+    #       size 響應內容長度（字節，見 check_api_response），按此判斷是否寫入臨時文件，只有寫入時才序列化；
+    #            未提供時字符串按長度判斷，其他數據序列化後判斷
+    def store(self, api_id, value, size=None):
+        with self.lock:
+            self.discard(api_id)
+            # 已讀取完所有用例且沒有用例引用時不再保存
+            if self.sealed and not self.consumers.get(api_id):
+                self.stats['dropped'] += 1
+                return
+            self.stats['stored'] += 1
+            data = None
+            if size is None:
+                if isinstance(value, (str, bytes)):
+                    size = len(value)
+                else:
+                    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+                    size = len(data)
+            if size > self.spill_size:
+                if not self.spill_dir:
+                    self.spill_dir = tempfile.mkdtemp(prefix='api_test_res_')
+                fd, path = tempfile.mkstemp(dir=self.spill_dir)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data or pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+                self.spilled[api_id] = path
+                self.stats['spilled'] += 1
+            else:
+                self.data[api_id] = value
+            self.stats['peak'] = max(self.stats['peak'], len(self.data) + len(self.spilled))
+
+    def __delitem__(self, api_id):
+        with self.lock:
+            if api_id not in self:
+                raise KeyError(api_id)
+            self.discard(api_id)
+
+    def __contains__(self, api_id):
+        return api_id in self.data or api_id in self.spilled
+
+    def __iter__(self):
+        with self.lock:
+            return iter(list(self.data) + list(self.spilled))
+
+    def __len__(self):
+        return len(self.data) + len(self.spilled)
+
+    # 作用：刪除返回數據（包括臨時文件），不存在時忽略
+    # 參數：api_id 接口 ID
+    def discard(self, api_id):
+        with self.lock:
+            self.data.pop(api_id, None)
+            path = self.spilled.pop(api_id, None)
+        if path:
+            os.remove(path)
+
+    # 作用：登記一條用例引用到的返回數據
+    # 參數：api_ids 被引用的 api_id 集合（見 get_case_refs）
+    def add_consumers(self, api_ids):
+        with self.lock:
+            for api_id in api_ids:
+                self.consumers[api_id] = self.consumers.get(api_id, 0) + 1
+
+    # 作用：一條用例執行完後釋放它引用的返回數據，已沒有用例引用的（所有用例讀取完後）即刪除
+    # 參數：api_ids 同 add_consumers
+    def release(self, api_ids):
+        with self.lock:
+            for api_id in api_ids:
+                self.consumers[api_id] -= 1
+                if not self.consumers[api_id]:
+                    del self.consumers[api_id]
+                    if self.sealed:
+                        self.discard(api_id)
+
+    # 作用：所有用例讀取完後調用，刪除沒有用例引用的返回數據
+    def seal(self):
+        with self.lock:
+            self.sealed = True
+            for api_id in list(self):
+                if not self.consumers.get(api_id):
+                    self.discard(api_id)
+
+    # 作用：刪除所有返回數據及臨時文件
+    def close(self):
+        with self.lock:
+            self.data.clear()
+            self.spilled.clear()
+            if self.spill_dir:
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+                self.spill_dir = None
+
+
+# 作用：保存用例的接口返回數據
+#       ResponseStore 按響應內容長度判斷是否寫入臨時文件，其他（如壓力測試中每個虛擬用戶的字典）直接保存
+# 參數：res 接口返回數據存儲
+#       api_id 接口 ID
+#       value 返回數據
+#       size 響應內容長度（字節）
+def save_response(res, api_id, value, size):
+    if isinstance(res, ResponseStore):
+        res.store(api_id, value, size)
+    else:
+        res[api_id] = value
+
+
+# 作用：獲取一條用例需等待執行完的用例（run_test_cases / run_test_cases_async 共用）
+#       引用 res['api_id'] 的用例（讀取）須等待之前最近一條該 api_id 的用例（寫入）；
+#       用例本身的 api_id 會覆蓋返回數據，須等待之前最近一條同 api_id 的用例及之後所有引用它的用例，以免覆蓋仍在使用的數據
+# 參數：test_case 測試用例
+#       refs 用例引用的 api_id 集合（見 get_case_refs）
+#       writers api_id -> 最近一條該 api_id 用例的標識（序號或任務）
+#       readers api_id -> 最近一條該 api_id 用例之後引用它的用例標識列表
+# 返回：需等待的用例標識列表（可能重複）
+def get_case_deps(test_case, refs, writers, readers):
+    deps = [writers[api_id] for api_id in refs if api_id in writers]
+    if test_case['api_id'] in writers:
+        deps.append(writers[test_case['api_id']])
+    deps.extend(readers.get(test_case['api_id'], ()))
+    return deps
+
+
+# 作用：登記用例讀寫的返回數據（見 get_case_deps），須在讀取下一條用例前調用
+# 參數：test_case / refs / writers / readers 同 get_case_deps
+#       key 該用例的標識
+def add_case_access(test_case, refs, writers, readers, key):
+    for api_id in refs:
+        readers.setdefault(api_id, []).append(key)
+    writers[test_case['api_id']] = key
+    readers.pop(test_case['api_id'], None)
+
+
+# 作用：按依賴關係調度執行測試用例
+#       沒有互相引用（res['api_id']）且 api_id 不同的用例可同時執行（見 get_case_deps），並發數由「Basic Data」中 max_workers 決定（默認 1，即逐條執行）
+#       登入用例為屏障：須等待之前的用例全部執行完才開始，之後的用例須等待登入完成
+#       用例連接異常需重試時不佔用線程等待，到時間後重新放入執行隊列，期間其他用例照常執行
+# 參數：test_cases 測試用例（按 Excel 行順序，只包含需執行的用例；可為邊讀取邊生成的迭代器）
+#       res 接口返回數據存儲（見 ResponseStore）
+#       sessions 會話池
+#       basic_data Excel 中基礎數據
+#       report 報告（每條用例執行完即發送執行結果事件，見 Report）
+# 返回：每條用例的執行結果（見 collect_result）
+def run_test_cases(test_cases, res, sessions, basic_data, report):
+    max_workers = get_max_workers(basic_data)
+    if max_workers > 1:
+        logging.info('>>>>> 並行執行測試用例，最大並發數：%d <<<<<' % (max_workers,))
+
+    case_results = []   # 每條用例的執行結果（成功與否、執行時間），保存到執行歷史
+    pending = []        # 等待執行的用例：(序號, 用例, 依賴的用例序號)
+    running = {}        # future -> (序號, 用例, 第幾次嘗試)
+    delayed = []        # 等待重試的用例：(可重試的時間, 序號, 用例, 第幾次嘗試)
+    retried = {}        # 用例序號 -> 之前失敗的嘗試耗時及等待時間 [耗時, 等待]
+    finished = set()    # 已執行完的用例序號
+    last_index = {}     # api_id -> 最近一條該 api_id 用例的序號
+    readers = {}        # api_id -> 最近一條該 api_id 用例之後引用它的用例序號
+    case_refs = {}      # 用例序號 -> 引用的 api_id 集合（執行完後釋放）
+    barrier = None      # 最近一條登入用例的序號，之後讀取的用例都須等待它執行完
+    login_failed = False
+
+    # 邊讀取邊執行：每輪只讀取一條用例，讀取完之前不阻塞等待
+    intake = enumerate(test_cases)
+    intake_done = False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while not intake_done or pending or running or delayed:
+            if not intake_done:
+                try:
+                    index, test_case = next(intake)
+                except StopIteration:
+                    intake_done = True
+                    # 所有用例已讀取，沒有用例引用的返回數據不再保存
+                    res.seal()
+                else:
+                    # 只依賴在它之前的用例（之後的用例在逐條執行時本來就引用不到）
+                    refs = get_case_refs(test_case)
+                    deps = set(get_case_deps(test_case, refs, last_index, readers))
+                    if is_login_case(test_case):
+                        barrier = index
+                    elif barrier is not None:
+                        deps.add(barrier)
+                    add_case_access(test_case, refs, last_index, readers, index)
+                    # 登記引用的返回數據（登入用例執行完後還需判斷是否登入成功）
+                    case_refs[index] = refs | {test_case['api_id']} if is_login_case(test_case) else refs
+                    res.add_consumers(case_refs[index])
+                    pending.append((index, test_case, deps))
+
+            # 先執行到時間的重試用例
+            now = time.perf_counter()
+            for item in sorted(delayed, key=operator.itemgetter(0)):
+                if len(running) >= max_workers or item[0] > now:
+                    break
+                delayed.remove(item)
+                ready_time, index, test_case, attempt = item
+                emit_start(report, index, test_case, attempt)
+                running[pool.submit(run_test_case, test_case, res, sessions, basic_data, attempt)] = (index, test_case, attempt)
+
+            for item in list(pending):
+                if len(running) >= max_workers:
+                    break
+                index, test_case, deps = item
+                if is_login_case(test_case):
+                    # 登入用例之後的用例都不能先執行（開始執行登入後由 deps 中的 barrier 保證）
+                    if item is pending[0] and not running and not delayed:
+                        pending.remove(item)
+                        emit_start(report, index, test_case, 1)
+                        running[pool.submit(run_login_case, test_case, res, sessions, basic_data, report, index)] = (index, test_case, 1)
+                    break
+                if deps <= finished:
+                    pending.remove(item)
+                    emit_start(report, index, test_case, 1)
+                    running[pool.submit(run_test_case, test_case, res, sessions, basic_data)] = (index, test_case, 1)
+
+            # 沒有用例在執行時等待最早的重試用例；讀取完用例前不阻塞
+            timeout = None if intake_done else 0
+            if delayed:
+                timeout = max(min(item[0] for item in delayed) - time.perf_counter(), 0) if intake_done else 0
+            if not running:
+                if timeout:
+                    time.sleep(timeout)
+                continue
+            done, _ = concurrent.futures.wait(running, timeout=timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                index, test_case, attempt = running.pop(future)
+                try:
+                    result = future.result()
+                except RetryCase as e:
+                    spent = retried.setdefault(index, [0, 0])
+                    spent[0] += e.time_spend
+                    spent[1] += e.delay
+                    delayed.append((time.perf_counter() + e.delay, index, test_case, attempt + 1))
+                    emit_retry(report, index, test_case, attempt, e.delay)
+                    continue
+                collect_result(index, test_case, result, report, case_results, retried.get(index))
+                res.release(case_refs.pop(index))
+                finished.add(index)
+                if is_login_case(test_case) and not result[2]:
+                    login_failed = True
+
+            if login_failed:
+                # 登入失敗時不再執行其他用例（已開始執行的用例不受影響，等待重試的用例不再重試）
+                for future in concurrent.futures.as_completed(running):
+                    index, test_case, attempt = running[future]
+                    try:
+                        collect_result(index, test_case, future.result(), report, case_results, retried.get(index))
+                    except RetryCase:
+                        pass
+                break
+
+    if login_failed:
+        logging.error('\n>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<\n')
+        report.emit({'event': 'login_failed'})
+    return case_results
+
+
+# 作用：記錄一條用例的執行結果並發送到報告（供 run_test_cases 使用）
+# 參數：index 用例序號
+#       test_case 測試用例
+#       result run_test_case / run_login_case 的返回值
+#       report / case_results 同 run_test_cases
+#       retried 之前失敗的嘗試耗時及等待時間 [耗時, 等待]，計入用例執行時間
+def collect_result(index, test_case, result, report, case_results, retried=None):
+    if result[1] and retried:
+        result[1]['time_spend'] += retried[0] + retried[1]
+        result[1]['phases']['retry_wait'] = result[1]['phases'].get('retry_wait', 0) + retried[1]
+    event = get_case_event(index, test_case, result)
+    case_results.append(event)
+    report.emit(event)
+
+
+# 作用：生成一條用例執行完的事件
+# 參數：index / test_case / result 同 collect_result
+def get_case_event(index, test_case, result):
+    return {
+        'event': 'case',
+        'index': index,
+        'api_id': test_case['api_id'],
+        'api_title': test_case['api_title'],
+        'api_url': test_case['api_url'],
+        # 沒有錯誤信息即為執行成功
+        'success': not result[0],
+        'failures': result[0],
+        # 未執行接口時為 None
+        'time_spend': result[1]['time_spend'] if result[1] else None,
+        'phases': result[1]['phases'] if result[1] else {},
+        }
+
+
+# 作用：發送用例開始執行（一次嘗試）的事件
+# 參數：report 報告
+#       index 用例序號
+#       test_case 測試用例
+#       attempt 第幾次嘗試
+def emit_start(report, index, test_case, attempt):
+    report.emit({'event': 'start', 'index': index, 'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'attempt': attempt})
+
+
+# 作用：發送用例連接異常或登入失敗、等待重試的事件
+# 參數：report / index / test_case / attempt 同 emit_start
+#       delay 重試前等待時間（秒）
+def emit_retry(report, index, test_case, attempt, delay):
+    report.emit({'event': 'retry', 'index': index, 'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'attempt': attempt, 'delay': delay})
+
+
+# 報告：把執行過程中的事件依次發送給各輸出（sink），各輸出邊收邊寫，不在內存中拼接整份報告
+#   事件為字典，event 鍵表示類型：
+#     start 用例開始一次嘗試（見 emit_start）；retry 連接異常或登入失敗等待重試（見 emit_retry）；
+#     case 一條用例執行完（見 collect_result）；login_failed 登入失敗；
+#     summary 執行結束時的統計 {'percentiles', 'pool_stats'}；regressions 響應時間退化 {'window', 'items'}；
+#     http_cache HTTP 緩存命中情況 {'stats'}（見 HttpCache，分佈式執行時每個分片一個）
+#   輸出需實現 handle(event) 和 close() 兩個方法
+class Report(object):
+    def __init__(self, sinks):
+        self.lock = threading.Lock()
+        self.sinks = list(sinks)
+
+    # 作用：發送事件到所有輸出（單個輸出出錯不影響其他輸出）
+    # 參數：event 事件字典
+    def emit(self, event):
+        event.setdefault('time', time.time())
+        with self.lock:
+            for sink in self.sinks:
+                try:
+                    sink.handle(event)
+                except Exception as e:
+                    logging.warning('報告輸出「%s」出錯 >> 異常：%s %s' % (type(sink).__name__, type(e), e.args))
+
+    def close(self):
+        with self.lock:
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    logging.warning('報告輸出「%s」出錯 >> 異常：%s %s' % (type(sink).__name__, type(e), e.args))
+
+
+# 郵件報告：收集事件，全部執行完後生成一次郵件正文，按「Basic Data」中 if_mail 下發
+class MailSink(object):
+    def __init__(self, basic_data):
+        self.basic_data = basic_data
+        self.cases = []
+        self.login_failed = False
+        self.summary = {'percentiles': {}, 'pool_stats': []}
+        self.regressions = None
+        self.cache_stats = {}
+
+    def handle(self, event):
+        if event['event'] == 'case':
+            self.cases.append(event)
+        elif event['event'] == 'login_failed':
+            self.login_failed = True
+        elif event['event'] == 'summary':
+            self.summary = event
+        elif event['event'] == 'regressions':
+            self.regressions = event
+        elif event['event'] == 'http_cache':
+            # 分佈式執行時累加各分片的統計
+            for key, value in event['stats'].items():
+                self.cache_stats[key] = self.cache_stats.get(key, 0) + value
+
+    # 作用：生成需要通知的問題（執行失敗的用例按 Excel 行順序、登入失敗、響應時間退化）
+    # 返回：郵件正文片段列表，沒有問題時為空列表
+    def render_problems(self):
+        parts = []
+        for event in sorted(self.cases, key=operator.itemgetter('index')):
+            for details in event['failures']:
+                parts.append('API: %s >> 執行失敗 >><br>%s<br>' % (event['api_title'], ''.join('>> %s<br>' % (line,) for line in details)))
+        if self.login_failed:
+            parts.append('>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<')
+        if not self.cases:
+            parts = ['未執行任何接口測試<br>']
+        # 響應時間比歷史基準明顯變慢的接口（檢查點雖通過，同樣需要通知）
+        if self.regressions:
+            parts.append('響應時間退化（與最近 %d 次成功執行的中位數比較）：<br>' % (self.regressions['window'],))
+            for item in self.regressions['items']:
+                parts.append('API: %s >> 本次 %.3f 秒，基準 %.3f 秒（%d 次）<br>' % (item['api_title'], item['time_spend'], item['baseline'], item['samples']))
+            parts.append('<br>')
+        return parts
+
+    # 作用：生成所有接口執行成功時的郵件正文（各接口執行時間、歷史百分位數及連接池使用情況）
+    def render_success(self):
+        # mail_content_random 接口正常時的隨機郵件正文
+        # .split(';') 通過「;」劃分把 mail_content_random 轉為列表
+        parts = [random.choice(self.basic_data['mail_content_random'].split(';'))]
+
+        # 按執行時間逆序排序；只有所有接口執行成功才顯示各個接口執行時間（郵件形式）
+        time_record_sort = sorted((event for event in self.cases if event['time_spend'] is not None), key=operator.itemgetter('time_spend'), reverse=True)
+        parts.append('<br><br>各個接口執行測試時間排序：<br><br>接口名稱 : 執行時間（秒）〔各階段耗時〕')
+        for item in time_record_sort:
+            parts.append('<br>%s : %.2f〔%s〕' % (item['api_title'], item['time_spend'], format_phases(item['phases'])))
+
+        # 歷史響應時間百分位數（超過最大區間時顯示為「-」）
+        parts.append('<br><br>各個接口歷史響應時間百分位數：<br><br>接口名稱 : p50 / p95 / p99（毫秒）〔累計次數〕')
+        for item in time_record_sort:
+            percentiles = self.summary['percentiles'].get(item['api_id'])
+            if percentiles:
+                parts.append('<br>%s : %s〔%d〕' % (item['api_title'], ' / '.join('≤%d' % (value,) if value else '-' for value in percentiles['values']), percentiles['count']))
+
+        parts.append('<br><br>連接池使用情況：<br>')
+        for item in self.summary['pool_stats']:
+            parts.append('<br>%s' % (format_pool_stats(item),))
+        if self.cache_stats:
+            parts.append('<br><br>HTTP 緩存：%s' % (format_cache_stats(self.cache_stats),))
+        return ''.join(parts)
+
+    def close(self):
+        basic_data = self.basic_data
+        # .split(',') 通過「,」劃分把 mail_to_* 轉為列表
+        mail_to_all = basic_data['mail_to_all'].strip().replace(' ', '').split(',')
+        mail_to_me = basic_data['mail_to_me'].strip().replace(' ', '').split(',')
+        problems = self.render_problems()
+        contact = '<br><b>如有問題，請致電 <font color="red">%s</font>（%s）。</b>' % (basic_data['contact_phone'], basic_data['contact_name'])
+
+        # if_mail 是否郵件通知測試結果
+        #    0 不下發郵件；1 每次都下發郵件；2 僅接口出錯時下發郵件
+        if basic_data['if_mail'] == 1:
+            if problems:
+                send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to_all, basic_data['mail_sub'], '%s%s' % (''.join(problems), contact))
+            else:
+                send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to_me, '%s〔正常〕' % (basic_data['mail_sub'],), self.render_success())
+        elif basic_data['if_mail'] == 2 and problems:
+            send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to_all, basic_data['mail_sub'], '%s%s' % (''.join(problems), contact))
+
+
+# 控制台報告：每條用例執行完即顯示一行結果，結束時顯示通過 / 失敗數
+class ConsoleSink(object):
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.passed = 0
+        self.failed = 0
+
+    def handle(self, event):
+        if event['event'] == 'case':
+            if event['success']:
+                self.passed += 1
+            else:
+                self.failed += 1
+            time_spend = '（%.3f 秒）' % (event['time_spend'],) if event['time_spend'] is not None else ''
+            self.stream.write('[%s] %s%s\n' % ('通過' if event['success'] else '失敗', event['api_title'], time_spend))
+            for details in event['failures']:
+                for line in details:
+                    self.stream.write('    >> %s\n' % (line,))
+        elif event['event'] == 'login_failed':
+            self.stream.write('>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<\n')
+        elif event['event'] == 'regressions':
+            for item in event['items']:
+                self.stream.write('[退化] %s 本次 %.3f 秒，基準 %.3f 秒\n' % (item['api_title'], item['time_spend'], item['baseline']))
+        elif event['event'] == 'http_cache':
+            self.stream.write('[緩存] %s\n' % (format_cache_stats(event['stats']),))
+        self.stream.flush()
+
+    def close(self):
+        self.stream.write('通過 %d / 失敗 %d\n' % (self.passed, self.failed))
+        self.stream.flush()
+
+
+# JUnit XML 報告（供 CI 使用）：用例結果邊執行邊寫入臨時文件，結束時加上匯總信息寫入 path
+class JUnitSink(object):
+    def __init__(self, path, name='api_test_with_xlsx'):
+        self.path = path
+        self.name = name
+        self.body = open('%s.tmp' % (path,), 'w+', encoding='utf-8')
+        self.tests = 0
+        self.failures = 0
+        self.time = 0
+
+    def handle(self, event):
+        if event['event'] != 'case':
+            return
+        self.tests += 1
+        time_spend = event['time_spend'] or 0
+        self.time += time_spend
+        self.body.write('    <testcase classname=%s name=%s time="%.3f">\n' % (xml.sax.saxutils.quoteattr(str(event['api_id'])), xml.sax.saxutils.quoteattr(str(event['api_title'])), time_spend))
+        if not event['success']:
+            self.failures += 1
+            lines = [line for details in event['failures'] for line in details]
+            self.body.write('      <failure message=%s>%s</failure>\n' % (xml.sax.saxutils.quoteattr(lines[-1]), xml.sax.saxutils.escape('\n'.join(lines))))
+        self.body.write('    </testcase>\n')
+
+    def close(self):
+        self.body.seek(0)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="utf-8"?>\n<testsuites>\n')
+            f.write('  <testsuite name=%s tests="%d" failures="%d" errors="0" time="%.3f">\n' % (xml.sax.saxutils.quoteattr(self.name), self.tests, self.failures, self.time))
+            shutil.copyfileobj(self.body, f)
+            f.write('  </testsuite>\n</testsuites>\n')
+        self.body.close()
+        os.remove('%s.tmp' % (self.path,))
+
+
+# JSONL 報告：每個事件寫一行 JSON（寫入後即刷新，可在執行過程中查看）
+class JsonlSink(object):
+    def __init__(self, path):
+        self.f = open(path, 'w', encoding='utf-8')
+
+    def handle(self, event):
+        self.f.write('%s\n' % (json.dumps(event, ensure_ascii=False, default=str),))
+        self.f.flush()
+
+    def close(self):
+        self.f.close()
+
+
+# 實時指標：執行過程中統計已執行完 / 失敗的用例數、正在執行的請求、重試次數及各接口最近 window 秒的響應時間
+#   listen 不為空時在該地址提供 Prometheus 文本格式的 /metrics（如 127.0.0.1:9108）；
+#   status_file 不為空時每 interval 秒重寫一次狀態文件（JSON）
+class MetricsSink(object):
+    def __init__(self, listen=None, status_file=None, window=60, interval=5):
+        self.lock = threading.Lock()
+        self.window = window
+        self.start_time = time.time()
+        self.last_time = None   # 最近一條用例執行完的時間
+        self.passed = 0
+        self.failed = 0
+        self.retries = 0
+        self.in_flight = {}     # 用例序號 -> (開始時間, api_id)
+        self.apis = {}          # api_id -> {'api_title', 'passed', 'failed', 'sum', 'count', 'recent': [(執行完的時間, 耗時)]}
+        self.server = None
+        self.status_file = status_file
+        self.stopped = threading.Event()
+        if listen:
+            host, _, port = listen.rpartition(':')
+            self.server = http.server.ThreadingHTTPServer((host or '127.0.0.1', int(port)), MetricsHandler)
+            self.server.daemon_threads = True
+            self.server.metrics = self
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+            logging.info('>>>>> 實時指標：http://%s:%s/metrics <<<<<' % (host or '127.0.0.1', port))
+        if status_file:
+            self.writer = threading.Thread(target=self.write_status_loop, args=(interval,), daemon=True)
+            self.writer.start()
+
+    def handle(self, event):
+        with self.lock:
+            if event['event'] == 'start':
+                self.in_flight[event['index']] = (event['time'], event['api_id'])
+            elif event['event'] == 'retry':
+                self.in_flight.pop(event['index'], None)
+                self.retries += 1
+            elif event['event'] == 'case':
+                self.in_flight.pop(event['index'], None)
+                self.last_time = event['time']
+                item = self.apis.get(event['api_id'])
+                if not item:
+                    item = self.apis[event['api_id']] = {'api_title': event['api_title'], 'passed': 0, 'failed': 0, 'sum': 0, 'count': 0, 'recent': collections.deque()}
+                if event['success']:
+                    self.passed += 1
+                    item['passed'] += 1
+                else:
+                    self.failed += 1
+                    item['failed'] += 1
+                if event['time_spend'] is not None:
+                    item['sum'] += event['time_spend']
+                    item['count'] += 1
+                    item['recent'].append((event['time'], event['time_spend']))
+                    self.prune(item, event['time'])
+            elif event['event'] == 'login_failed':
+                # 登入失敗後不再執行其他用例
+                self.in_flight.clear()
+
+    # 作用：刪除超出統計時間窗口的響應時間
+    # 參數：item self.apis 中的一項
+    #       now 當前時間
+    def prune(self, item, now):
+        while item['recent'] and item['recent'][0][0] < now - self.window:
+            item['recent'].popleft()
+
+    # 作用：獲取當前狀態
+    # 返回：{'time', 'elapsed', 'passed', 'failed', 'retries', 'in_flight', 'oldest_in_flight', 'last_case', 'window',
+    #        'apis': {api_id: {'api_title', 'passed', 'failed', 'count', 'sum', 'recent', 'p50', 'p95', 'p99'}}}
+    #       （recent 為時間窗口內執行完的次數，p50 / p95 / p99 為其響應時間，沒有時為 None）
+    def get_status(self):
+        now = time.time()
+        with self.lock:
+            status = {'time': now, 'elapsed': now - self.start_time, 'passed': self.passed, 'failed': self.failed, 'retries': self.retries,
+                      'in_flight': len(self.in_flight), 'oldest_in_flight': now - min(start for start, api_id in self.in_flight.values()) if self.in_flight else 0,
+                      'last_case': self.last_time, 'window': self.window, 'apis': {}}
+            for api_id, item in self.apis.items():
+                self.prune(item, now)
+                recent = sorted(seconds for end_time, seconds in item['recent'])
+                api = {'api_title': item['api_title'], 'passed': item['passed'], 'failed': item['failed'], 'count': item['count'], 'sum': item['sum'], 'recent': len(recent)}
+                for percent in (50, 95, 99):
+                    api['p%d' % (percent,)] = get_percentile(recent, percent) if recent else None
+                status['apis'][api_id] = api
+        return status
+
+    # 作用：把當前狀態轉為 Prometheus 文本格式
+    def render_prometheus(self):
+        status = self.get_status()
+        label = lambda value: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        lines = [
+                '# HELP api_test_cases_total 已執行完的用例數',
+                '# TYPE api_test_cases_total counter',
+                'api_test_cases_total{result="passed"} %d' % (status['passed'],),
+                'api_test_cases_total{result="failed"} %d' % (status['failed'],),
+                '# HELP api_test_in_flight 正在執行的請求數',
+                '# TYPE api_test_in_flight gauge',
+                'api_test_in_flight %d' % (status['in_flight'],),
+                '# HELP api_test_oldest_in_flight_seconds 正在執行的請求中最長已執行的時間（秒）',
+                '# TYPE api_test_oldest_in_flight_seconds gauge',
+                'api_test_oldest_in_flight_seconds %.3f' % (status['oldest_in_flight'],),
+                '# HELP api_test_retries_total 連接異常後重試的次數',
+                '# TYPE api_test_retries_total counter',
+                'api_test_retries_total %d' % (status['retries'],),
+                '# HELP api_test_last_case_timestamp_seconds 最近一條用例執行完的時間',
+                '# TYPE api_test_last_case_timestamp_seconds gauge',
+                'api_test_last_case_timestamp_seconds %.3f' % (status['last_case'] or 0,),
+                '# HELP api_test_api_cases_total 各接口已執行完的用例數',
+                '# TYPE api_test_api_cases_total counter',
+                ]
+        for api_id, api in sorted(status['apis'].items()):
+            for result in ('passed', 'failed'):
+                lines.append('api_test_api_cases_total{api_id="%s",api_title="%s",result="%s"} %d' % (label(api_id), label(api['api_title']), result, api[result]))
+        lines.append('# HELP api_test_latency_seconds 各接口響應時間（分位數為最近 %d 秒內）' % (status['window'],))
+        lines.append('# TYPE api_test_latency_seconds summary')
+        for api_id, api in sorted(status['apis'].items()):
+            labels = 'api_id="%s",api_title="%s"' % (label(api_id), label(api['api_title']))
+            for percent in (50, 95, 99):
+                value = api['p%d' % (percent,)]
+                lines.append('api_test_latency_seconds{%s,quantile="%g"} %s' % (labels, percent / 100.0, 'NaN' if value is None else '%.6f' % (value,)))
+            lines.append('api_test_latency_seconds_sum{%s} %.6f' % (labels, api['sum']))
+            lines.append('api_test_latency_seconds_count{%s} %d' % (labels, api['count']))
+        return '%s\n' % ('\n'.join(lines),)
+
+    # 作用：寫入狀態文件（先寫臨時文件再替換，讀取時不會讀到寫了一半的文件）
+    def write_status(self):
+        with open('%s.tmp' % (self.status_file,), 'w', encoding='utf-8') as f:
+            json.dump(self.get_status(), f, ensure_ascii=False, indent=1)
+        os.replace('%s.tmp' % (self.status_file,), self.status_file)
+
+    # 作用：每 interval 秒重寫一次狀態文件，直到 close
+    def write_status_loop(self, interval):
+        while not self.stopped.wait(interval):
+            try:
+                self.write_status()
+            except OSError as e:
+                logging.warning('寫入狀態文件出錯 >> 異常：%s %s' % (type(e), e.args))
+
+    def close(self):
+        self.stopped.set()
+        if self.status_file:
+            self.writer.join()
+            self.write_status()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# 實時指標 HTTP 服務：GET /metrics 返回 Prometheus 文本格式的指標（見 MetricsSink）
+class MetricsHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.metrics.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('實時指標：%s' % (format % args,))
+
+
+# 作用：逐行讀取測試用例（讀取完畢後關閉 Excel 表）
+# 參數：wb 以只讀模式打開的 Excel 表
+#       sheet2 第二個表格名稱
+# 返回：只包含需執行的用例的生成器，每條用例為 {列標題: 單元格值} 字典
+def iter_test_cases(wb, sheet2):
+    try:
+        rows = wb[sheet2].iter_rows(values_only=True)
+        # 第一行為列標題（只讀取一次），第二行為說明
+        header = next(rows)
+        next(rows)
+        is_active = header.index('is_active')
+        for row in rows:
+            # is_active 等於 no 表示不執行該用例
+            if len(row) <= is_active or row[is_active] != 'yes':
+                continue
+            # 只讀模式下行尾空白單元格可能被省略
+            test_case = dict(zip(header, row + (None,) * (len(header) - len(row))))
+            test_case['api_url'] = 'http://%s%s' % (test_case['api_host'], test_case['req_url'])
+            yield test_case
+    finally:
+        wb.close()
+
+
+# 作用：預先編譯用例中的 req_data / check_point 表達式，執行時不用每次重新編譯
+# 參數：test_case 單條測試用例
+# 返回：增加了 req_data_tree / check_point_tree（語法樹）和 req_data_code / check_point_code（可執行函數）的測試用例
+#       （表達式有誤時為 None，執行時再報錯）
+def compile_test_case(test_case):
+    for key in ('req_data', 'check_point'):
+        tree = None
+        if test_case[key] and isinstance(test_case[key], str):
+            try:
+                tree = parse_expression(test_case[key])
+            except (SyntaxError, NameError):
+                pass
+        test_case['%s_tree' % (key,)] = tree
+        test_case['%s_code' % (key,)] = build_expression(tree) if tree else None
+    return test_case
+
+
+# 作用：計算測試計劃緩存的鍵值（Excel 表內容的 SHA-256，緩存格式不同時不通用）
+# 參數：同 load_test_case_file
+def get_plan_key(test_case_file, sheet1, sheet2):
+    h = hashlib.sha256(('%s\n' % (plan_format,)).encode('utf-8'))
+    h.update(('%s\n%s\n' % (sheet1, sheet2)).encode('utf-8'))
+    with open(test_case_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# 作用：把從 JSON 讀取的語法樹還原為元組（JSON 中元組保存為列表；語法樹中的常量不會是列表）
+# 參數：value 語法樹（或其中的一項）
+def load_expression_tree(value):
+    if isinstance(value, list):
+        return tuple(load_expression_tree(item) for item in value)
+    return value
+
+
+# 作用：讀取已編譯的測試計劃緩存（JSON 格式，不使用 pickle，緩存文件被替換時也不會執行其中的代碼）
+# 參數：plan_file 緩存文件路徑
+#       plan_key Excel 表內容對應的鍵值
+# 返回：測試計劃字典（basic_data / test_cases）；緩存不存在或 Excel 表已修改時返回 None
+def load_test_plan(plan_file, plan_key):
+    try:
+        with open(plan_file, encoding='utf-8') as f:
+            plan = json.load(f)
+        if plan['key'] != plan_key:
+            return None
+        for test_case in plan['test_cases']:
+            for key in ('req_data', 'check_point'):
+                tree = test_case['%s_tree' % (key,)] = load_expression_tree(test_case['%s_tree' % (key,)])
+                test_case['%s_code' % (key,)] = build_expression(tree) if tree else None
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning('測試計劃緩存「%s」無法讀取，重新讀取 Excel 表 >> 異常：%s %s' % (plan_file, type(e), e.args))
+        return None
+    return plan
+
+
+# 作用：保存已編譯的測試計劃（JSON 格式，只保存語法樹，可執行函數在讀取時重新生成）
+#       單元格中有 JSON 無法保存的值（如日期）時不保存緩存，下次仍讀取 Excel 表
+# 參數：plan_file 緩存文件路徑
+#       plan_key Excel 表內容對應的鍵值
+#       basic_data 基礎數據
+#       test_cases 已編譯的測試用例列表
+def save_test_plan(plan_file, plan_key, basic_data, test_cases):
+    cases = []
+    for test_case in test_cases:
+        cases.append(dict((key, value) for key, value in test_case.items() if not key.endswith('_code')))
+    try:
+        # 先寫臨時文件再替換，避免其他進程讀到寫了一半的緩存
+        data = json.dumps({'key': plan_key, 'basic_data': basic_data, 'test_cases': cases}, ensure_ascii=False)
+        with open('%s.tmp' % (plan_file,), 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace('%s.tmp' % (plan_file,), plan_file)
+    except (OSError, TypeError, ValueError) as e:
+        logging.warning('測試計劃緩存「%s」保存失敗 >> 異常：%s %s' % (plan_file, type(e), e.args))
+
+
+# 作用：邊讀取邊編譯測試用例，全部讀取完後保存測試計劃緩存
+# 參數：plan_file / plan_key / basic_data 同 save_test_plan
+#       test_cases 測試用例生成器（見 iter_test_cases）
+def compile_test_cases(plan_file, plan_key, basic_data, test_cases):
+    compiled = []
+    for test_case in test_cases:
+        compiled.append(compile_test_case(test_case))
+        yield test_case
+    save_test_plan(plan_file, plan_key, basic_data, compiled)
+
+
+# 作用：打開 Excel 表（只讀模式，只打開一次），讀取基礎數據
+#       Excel 表內容未修改時直接使用上次保存的測試計劃緩存（Excel 表同目錄下的 .plan 文件）
 # 參數：test_case_file 為測試數據所在 Excel 表文件路徑
 #       sheet1 第一個表格名稱
 #       sheet2 第二個表格名稱
-def get_test_case(test_case_file, sheet1, sheet2):
-    # 邮件正文
-    mail_content = ''
-    # 以字典形式存放数据，便于后续操作
-    res = {}    # 接口返回数据
-    basic_data = {}     # Excel 中基础数据
-    # 以列表形式记录每个接口执行时间
-    time_record = []
-
-    # 使所有的請求保持同一會話
-    s = requests.Session()
-
-    # 獲取第一個表格數據
+# 返回：基礎數據字典和測試用例生成器（見 iter_test_cases）
+def load_test_case_file(test_case_file, sheet1, sheet2):
+    plan_file = '%s.plan' % (os.path.splitext(test_case_file)[0],)
+    plan_key = get_plan_key(test_case_file, sheet1, sheet2)
+    plan = load_test_plan(plan_file, plan_key)
+    if plan:
+        logging.info('Excel 表未修改，使用測試計劃緩存「%s」' % (plan_file,))
+        return plan['basic_data'], iter(plan['test_cases'])
+
+    basic_data = {}
+    # read_only=True 以流式方式讀取，不會把整個表格載入內存
     # data_only=True 可避免讀取到單元格的公式
-    #wb = openpyxl.load_workbook(test_case_file, data_only=True)
-    wb = openpyxl.load_workbook(test_case_file)
-    ws1 = wb[sheet1]
+    #wb = openpyxl.load_workbook(test_case_file, read_only=True, data_only=True)
+    wb = openpyxl.load_workbook(test_case_file, read_only=True)
 
     # 把表格數據讀取到字典
     # 從第三行開始，讀取每一行數據
-    for r in range(3, ws1.max_row + 1):
-        r_key = ws1.cell(row=r, column=1).value
-        r_value = ws1.cell(row=r, column=2).value
+    for r_key, r_value in wb[sheet1].iter_rows(min_row=3, max_col=2, values_only=True):
+        # 只讀模式下可能讀取到空行
+        if r_key is None:
+            continue
         # .strip 去除字符串前後空格（包括 Tab 和換行）
         # .replace(' ', '') 去除字符串所有空格
         try:
@@ -181,167 +2216,106 @@ def get_test_case(test_case_file, sheet1, sheet2):
         except AttributeError:
             basic_data[r_key.strip()] = r_value
 
-    # .split(',') 通過「,」劃分把 mail_to_* 轉為列表
-    mail_to_all = basic_data['mail_to_all'].strip().replace(' ', '').split(',')
-    mail_to_me = basic_data['mail_to_me'].strip().replace(' ', '').split(',')
-
-    # 獲取第二個表格數據
-    wb = openpyxl.load_workbook(test_case_file)
-    ws2 = wb[sheet2]
-    for r in range(3, ws2.max_row + 1):
-        # 每一行為一條獨立測試用例，執行完才會執行下一條用例
-        test_case = {}
-        for c in range(1, ws2.max_column + 1):
-            c_key = ws2.cell(row=1, column=c).value
-            c_value = ws2.cell(row=r, column=c).value
-            test_case[c_key] = c_value
-
-        # is_active 等於 no 表示不執行該用例，直接執行下一次循環
-        if test_case['is_active'] == 'yes':
-            pass
-        else:
-            continue
+    return basic_data, compile_test_cases(plan_file, plan_key, basic_data, iter_test_cases(wb, sheet2))
 
-        test_case['api_url'] = 'http://%s%s' % (test_case['api_host'], test_case['req_url'])
 
-        # 存放接口執行結果
-        res[test_case['api_id']] = {}
+# 作用：按「Basic Data」中 engine 執行測試用例：thread 多線程（默認，見 run_test_cases）；async 異步（見 run_test_cases_async）
+# 參數：test_cases / basic_data / report 同 run_test_cases
+# 返回：每條用例的執行結果和連接池使用情況
+def run_engine(test_cases, basic_data, report):
+    engine = basic_data.get('engine') or 'thread'
+    if engine not in ('thread', 'async'):
+        logging.error('「engine」參數不正確，使用 thread')
+        engine = 'thread'
+    elif engine == 'async' and not aiohttp:
+        logging.error('異步執行需要安裝第三方庫 aiohttp，改為使用 thread')
+        engine = 'thread'
 
-        # req_data 接口請求數據不為 None 時，把數據轉為字典
-        if test_case['req_data']:
+    # 接口返回数据（只保留之後的用例會引用到的）
+    res = ResponseStore(basic_data)
+    # get 請求的 HTTP 緩存（「Basic Data」中 http_cache 設置為 1 時使用）
+    http_cache = get_http_cache(basic_data)
+    try:
+        if engine == 'async':
+            case_results, pool_stats = asyncio.run(run_test_cases_async(test_cases, res, basic_data, report, http_cache))
+        else:
+            # 使所有的請求保持同一會話（各主機的會話共用 Cookie）
+            sessions = SessionPool(basic_data, http_cache)
             try:
-                # eval 將 excel 表裏的參數轉為正確的值
-                #     eval 方法存在風險，鑑於此腳本不與外界交互，暫不考慮安全性
-                test_case['req_data'] = eval(test_case['req_data'])
-            except (NameError, KeyError, SyntaxError) as e:
-                logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (test_case['api_title'], type(e), e.args))
-                mail_content = '%sAPI: %s >> 執行失敗 >><br>>> URL: %s<br>>> 異常：%s %s<br><br>' % (mail_content, test_case['api_title'], test_case['api_url'], type(e), e.args)
-                continue
+                case_results = run_test_cases(test_cases, res, sessions, basic_data, report)
+                pool_stats = sessions.get_stats()
+            finally:
+                sessions.close()
+    finally:
+        res.close()
+        if http_cache:
+            http_cache.close()
+    logging.info('返回數據：保存 %(stored)d 條 / 無需保存 %(dropped)d 條 / 寫入臨時文件 %(spilled)d 條 / 最多同時保存 %(peak)d 條' % res.stats)
+    if http_cache:
+        logging.info('HTTP 緩存：%s' % (format_cache_stats(http_cache.stats),))
+        report.emit({'event': 'http_cache', 'stats': dict(http_cache.stats)})
+    return case_results, pool_stats
 
-            if not isinstance(test_case['req_data'], dict):
-                logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_data」要求為字典類型 - %s' % (test_case['api_title'], test_case['req_data']))
-                mail_content = '%sAPI: %s >> 執行失敗 >><br>>> URL: %s<br>>> 原因：「req_data」要求為字典類型 - %s<br><br>' % (mail_content, test_case['api_title'], test_case['api_url'], test_case['req_data'])
-        else:
-            test_case['req_data'] = ''
 
-        # check_point 檢查點為 None 時該用例不再執行
-        if not test_case['check_point']:
-            logging.error('API: %s >> 執行失敗 >> 「check_point」不可為空' % (test_case['api_title'],))
-            mail_content = '%sAPI: %s >> 執行失敗 >><br>%s<br>「check_point」不可為空<br><br>' % (mail_content, test_case['api_title'], test_case['api_url'])
-            continue
+# 作用：獲取 Excel 表中所有測試數據
+# 參數：test_case_file 為測試數據所在 Excel 表文件路徑
+#       sheet1 第一個表格名稱
+#       sheet2 第二個表格名稱
+#       sinks 郵件以外的報告輸出（如 ConsoleSink / JUnitSink / JsonlSink）
+#       workers 本地工作進程數（大於 1 或有遠程工作節點時分片執行，見 run_distributed）
+#       worker_urls 遠程工作節點地址列表
+#       worker_token 與遠程工作節點共享的令牌（工作節點設置了 --worker-token 時必須一致）
+# 返回：每條用例的執行結果（見 collect_result）
+def get_test_case(test_case_file, sheet1, sheet2, sinks=(), workers=1, worker_urls=(), worker_token=None):
+    # basic_data Excel 中基础数据；test_cases 邊讀取邊執行的測試用例
+    basic_data, test_cases = load_test_case_file(test_case_file, sheet1, sheet2)
 
-        # 執行登入接口，無法登入時進行多次嘗試
-        if re.match(r'^.*/user/login$', test_case['api_url']):
-            # 標記是否登入成功
-            login_success = False
-            # 成功則不需要記錄登入失敗的紀錄，失敗則只記錄一次登入接口失敗的紀錄
-            temp_content = mail_content
-            # 多次登录后，只记录一次登录接口执行时间
-            temp_time = time_record
-            # 设置重新登录前等待时间
-            retry_time = 30
-            # 嘗試 3 次登入（由於業務要求第 4 次起需要驗證碼，無法再次嘗試）
-            for count in range(1, 4):
-                time_record = temp_time
-                # 開始記錄接口執行時間（只記錄運行「run_api」函數使用時間）
-                time_before = time.time()
-                res[test_case['api_id']], mail_content = run_api(test_case['req_file'], res, s, test_case['api_url'], test_case['req_method'], test_case['req_data_type'], test_case['req_data'], test_case['api_title'], test_case['check_point'], mail_content)
-                time_after = time.time()
-                time_spend = round((time_after - time_before), 2)
-                # 接口执行时间记录到 time_record 列表中
-                time_record.append({'api_title': test_case['api_title'], 'time_spend': time_spend})
-
-                if str(res[test_case['api_id']]).count("'msg': 'success'") > 0:
-                    login_success = True
-                    # 如果登入成功而非第一次執行登入接口，則把之前登入失敗的紀錄清除
-                    if count != 1:
-                        mail_content = temp_content
-                    ##------ 備份1：通過「session id」保持同一會話（保證登入狀態） ------##
-                    ## run_api 函數裏會把登入接口的 session_id（如在 Excel 表中未設置）保存到接口返回值中
-                    #if 'session_id' in res[test_case['api_id']]:
-                    #    basic_data['session_id'] = res[test_case['api_id']]['session_id']
-                    #else:
-                    #    pass
-                    break
-                else:
-                    # 儲存第一次登入失敗的信息，多次嘗試後還是失敗時只保留這個紀錄
-                    if count == 1:
-                        temp_content_err = mail_content
-                    # 每次失敗後等待一定時間（秒）後再嘗試
-                    logging.error('API: %s >> 执行失败 >>\n>> 登录失败，%s 秒后重试' % (test_case['api_title'], retry_time))
-                    time.sleep(retry_time)
-                    continue
-            if not login_success:
-                logging.error('\n>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<\n')
-                mail_content = '%s>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<' % (temp_content_err,)
-                break
-        else:
-            # 執行接口測試，把接口返回值保存在 res 字典中
-            time_before = time.time()
-            res[test_case['api_id']], mail_content = run_api(test_case['req_file'], res, s, test_case['api_url'], test_case['req_method'], test_case['req_data_type'], test_case['req_data'], test_case['api_title'], test_case['check_point'], mail_content)
-            time_after = time.time()
-            time_spend = round((time_after - time_before), 2)
-            time_record.append({'api_title': test_case['api_title'], 'time_spend': time_spend})
-
-    if res == {}:
-        logging.error('未執行任何接口測試\n')
-        mail_content = '未執行任何接口測試<br>'
-    else:
-        pass
+    # 執行結果邊執行邊發送到各報告輸出，郵件在最後生成一次
+    report = Report([MailSink(basic_data)] + list(sinks))
 
-    # if_mail 是否郵件通知測試結果
-    #    0 不下發郵件；1 每次都下發郵件；2 僅接口出錯時下發郵件
-    if basic_data['if_mail'] == 1:
-        if mail_content != '':
-            mail_content = '%s<br><b>如有問題，請致電 <font color="red">%s</font>（%s）。</b>' % (mail_content, basic_data['contact_phone'], basic_data['contact_name'])
-            mail_to = mail_to_all
-        else:
-            # mail_content_random 接口正常時的隨機郵件正文
-            # .split(';') 通過「;」劃分把 mail_content_random 轉為列表
-            contents = basic_data['mail_content_random'].split(';')
-            mail_content = random.choice(contents)
-            basic_data['mail_sub'] = '%s〔正常〕' % (basic_data['mail_sub'],)
-            mail_to = mail_to_me
-
-            # 按執行時間逆序排序；只有所有接口執行成功才顯示各個接口執行時間（郵件形式）
-            time_record_sort = sorted(time_record, key=operator.itemgetter('time_spend'), reverse=True)
-            mail_content = '%s<br><br>各個接口執行測試時間排序：<br><br>接口名稱 : 執行時間（秒）' % (mail_content,)
-            for item in time_record_sort:
-                mail_content = '%s<br>%s : %s' % (mail_content, item['api_title'], item['time_spend'])
-
-        send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to, basic_data['mail_sub'], mail_content)
-    elif basic_data['if_mail'] == 2:
-        if mail_content != '':
-            mail_content = '%s<br><b>如有問題，請致電 <font color="red">%s</font>（%s）。</b>' % (mail_content, basic_data['contact_phone'], basic_data['contact_name'])
-            mail_to = mail_to_all
-            send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to, basic_data['mail_sub'], mail_content)
-        else:
-            pass
+    if workers > 1 or worker_urls:
+        case_results, pool_stats = run_distributed(list(test_cases), basic_data, report, workers if workers > 1 else 0, list(worker_urls), worker_token)
     else:
-        pass
-    #print(mail_content)
+        case_results, pool_stats = run_engine(test_cases, basic_data, report)
+    for item in pool_stats:
+        logging.info('連接池：%s' % (format_pool_stats(item),))
+    time_record = [item for item in case_results if item['time_spend'] is not None]
+    histograms = update_latency_histogram(histogram_file, time_record)
+    run_id = save_run_history(history_file, test_case_file, case_results)
+
+    if not case_results:
+        logging.error('未執行任何接口測試\n')
+
+    # 歷史響應時間百分位數
+    percentiles = {}
+    for item in time_record:
+        histogram = histograms[item['api_id']]
+        percentiles[item['api_id']] = {'values': [get_histogram_percentile(histogram, percent) for percent in (50, 95, 99)], 'count': histogram['count']}
+    report.emit({'event': 'summary', 'percentiles': percentiles, 'pool_stats': pool_stats})
 
+    # 響應時間比歷史基準明顯變慢的接口
+    regressions = get_latency_regressions(history_file, run_id, basic_data) if run_id else []
+    if regressions:
+        for item in regressions:
+            logging.warning('API: %s >> 響應時間退化 >> 本次 %.3f 秒，基準 %.3f 秒' % (item['api_title'], item['time_spend'], item['baseline']))
+        report.emit({'event': 'regressions', 'window': regressions[0]['window'], 'items': regressions})
 
-def run_api(req_file, res, s, url, req_method, req_data_type, req_data, api_title, check_point, mail_content):
-    headers = {
-            'X-Requested-With':'XMLHttpRequest',
-            'Connection':'keep-alive',
-            'User-Agent':'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_5) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/50.0.2661.94 Safari/537.36'
-            }
+    # 郵件在此生成並按 if_mail 下發
+    report.close()
+    return case_results
 
-    # post 請求時指定提交數據類型
+
+def run_api(req_file, res, s, url, req_method, req_data_type, req_data, api_title, check_point, failures, check_point_code=None, retry_policy=None, attempt=1, http_cache=None):
+    # post 請求時指定提交數據類型（其他請求頭已在會話中設置）
     if not req_data_type:
         # 未選擇時指定默認值
         req_data_type = 'application/x-www-form-urlencoded'
-    if req_data_type in ('application/x-www-form-urlencoded', 'application/json'):
-        headers['Content-Type'] = '%s; charset=UTF-8' % (req_data_type,)
-    # 上傳文件時不指定 content-type，讓 requests 智能處理更簡單
-    elif req_data_type == 'multipart/form-data':
-        pass
+    if req_data_type in content_type_headers:
+        headers = content_type_headers[req_data_type]
     else:
         logging.error('API: %s >> 执行失败 >>\n>> 原因：「req_data_type」参数不正确。\n' % (api_title,))
-        mail_content = '%sAPI: %s >> 执行失败 >><br>>> 原因：「req_data_type」参数不正确。<br><br>' % (mail_content, api_title)
-        return {'msg': '执行失败'}, mail_content
+        failures.append(['原因：「req_data_type」参数不正确。'])
+        return {'msg': '执行失败'}
 
     ##------ 備份1：通過「session id」保持同一會話（保證登入狀態） ------##
     ## session_id 不為 None 時
@@ -350,80 +2324,123 @@ def run_api(req_file, res, s, url, req_method, req_data_type, req_data, api_titl
 
     # 設置請求超時時間
     out_time = 7
-    # 設置循環次數
-    roop_time = 3
-    # 設置重試等待時間
-    retry_time = 10
-    for count in range(1, roop_time+1):
-        try:
-            if req_method == 'post' and req_data_type == 'application/x-www-form-urlencoded':
-                r = s.post(url, data=req_data, headers=headers, timeout=out_time)
-            elif req_method == 'post' and req_data_type == 'application/json':
-                r = s.post(url, json=req_data, headers=headers, timeout=out_time)
-            elif req_method == 'post' and req_data_type == 'multipart/form-data':
-                # Excel 表中為空的單元格在腳本裏獲取到的值為 None
-                if not req_file:
-                    req_file = ''
-                with open(req_file, 'rb') as f:
-                    r = s.post(url, files={'file': f}, headers=headers, timeout=out_time)
-            elif req_method == 'get':
-                r = s.get(url, params=req_data, headers=headers, timeout=out_time) if req_data else s.get(url, headers=headers, timeout=out_time)
-            else:
-                logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_method」參數不正確。\n' % (api_title,))
-                mail_content = '%sAPI: %s >> 執行失敗 >><br>>> 原因：「req_method」參數不正確。<br><br>' % (mail_content, api_title)
-                return {'msg': '執行失敗'}, mail_content
-            #print('返回结果：%s' % (r.text,))
-
-        # 連接異常（ConnectionError...MaxRetryError...Failed to establish a new connection...）
-        except requests.exceptions.ConnectionError as e:
-            if count == roop_time:
-                logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (api_title, type(e), e.args))
-                mail_content = '%sAPI: %s >> 執行失敗 >><br>>> 異常：%s %s<br><br>' % (mail_content, api_title, type(e), e.args)
-                return {'msg': '執行失敗'}, mail_content
-            else:
-                logging.error('API: %s >> 執行失敗 >>\n>> 連接異常，%s 秒後重試' % (api_title, retry_time))
-                time.sleep(retry_time)
-                continue
+    # 重試策略（未指定時使用默認策略）；每次只嘗試一次，還可重試時拋出 RetryCase 由調用方安排重試
+    if not retry_policy:
+        retry_policy = get_retry_policy({'api_title': api_title}, {})
+    # 如果 check_point 中有類似 export_file == 'file_name.xls' 這樣的
+    #     導出文件直接逐塊寫到本地，不讀入內存（resp 為空字符串，r.text / r.content 不可用）
+    export_file = get_export_file(check_point)
+    # stream=True 收到響應頭即返回，以便分開記錄首字節和下載響應的耗時
+    time_request = time.perf_counter()
+    phases_before = get_request_phases()
+    try:
+        if req_method == 'post' and req_data_type == 'application/x-www-form-urlencoded':
+            r = s.post(url, data=req_data, headers=headers, timeout=out_time, stream=True)
+        elif req_method == 'post' and req_data_type == 'application/json':
+            r = s.post(url, json=req_data, headers=headers, timeout=out_time, stream=True)
+        elif req_method == 'post' and req_data_type == 'multipart/form-data':
+            # 逐塊讀取上傳文件發送（見 MultipartEncoder），req_data 為其他表單字段
+            data = get_multipart_encoder(req_file, req_data)
+            r = s.post(url, data=data, headers=dict(headers, **{'Content-Type': data.content_type}), timeout=out_time, stream=True)
+        elif req_method == 'get' and http_cache and not export_file:
+            # 使用 HTTP 緩存（返回數據已讀取）
+            r = http_cache.get(s, url, req_data, headers, out_time)
+        elif req_method == 'get':
+            r = s.get(url, params=req_data, headers=headers, timeout=out_time, stream=True) if req_data else s.get(url, headers=headers, timeout=out_time, stream=True)
+        else:
+            logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_method」參數不正確。\n' % (api_title,))
+            failures.append(['原因：「req_method」參數不正確。'])
+            return {'msg': '執行失敗'}
+        #print('返回结果：%s' % (r.text,))
 
-        # 后续优化：断网时保存信息，下次执行判断到信息再发送出来
-        except requests.exceptions.RequestException as e:
-            logging.error('API: %s >> 执行失败 >>\n>> 异常：%s %s\n' % (api_title, type(e), e.args))
-            mail_content = '%sAPI: %s >> 执行失败 >><br>>> 异常：%s %s<br><br>' % (mail_content, api_title, type(e), e.args)
-            return {'msg': '执行失败'}, mail_content
-
-        # 找不到指定的上傳文件
-        except FileNotFoundError as e:
-            logging.error('API: %s >> 执行失败 >>\n>> 异常：%s %s\n' % (api_title, type(e), e.args))
-            mail_content = '%sAPI: %s >> 执行失败 >><br>>> 异常：%s %s<br><br>' % (mail_content, api_title, type(e), e.args)
-            return {'msg': '执行失败'}, mail_content
-
-        # 無連接異常，跳出循環
-        break
-
-    # 判斷接口返回結果是否為類 json 格式 { : }
-    if re.match(r'^{[^:]*:.*}$', r.text):
-        resp = json.loads(r.text)
-        #print('返回結果：%s' % (resp,))
-    else:
-        resp = r.text
+    # 連接異常（ConnectionError...MaxRetryError...Failed to establish a new connection...）
+    except requests.exceptions.ConnectionError as e:
+        if attempt >= retry_policy['times']:
+            logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (api_title, type(e), e.args))
+            failures.append(['異常：%s %s' % (type(e), e.args)])
+            return {'msg': '執行失敗'}
+        else:
+            retry_time = get_retry_delay(retry_policy, attempt)
+            logging.error('API: %s >> 執行失敗 >>\n>> 連接異常，%.1f 秒後重試（第 %d 次嘗試）' % (api_title, retry_time, attempt))
+            raise RetryCase(retry_time, attempt)
 
-    # 如果 check_point 中有類似 export_file == 'file_name.xls' 這樣的
+    # 后续优化：断网时保存信息，下次执行判断到信息再发送出来
+    except requests.exceptions.RequestException as e:
+        logging.error('API: %s >> 执行失败 >>\n>> 异常：%s %s\n' % (api_title, type(e), e.args))
+        failures.append(['异常：%s %s' % (type(e), e.args)])
+        return {'msg': '执行失败'}
+
+    # 找不到指定的上傳文件、上傳文件的表單字段不正確
+    except (FileNotFoundError, UploadFieldsError) as e:
+        logging.error('API: %s >> 执行失败 >>\n>> 异常：%s %s\n' % (api_title, type(e), e.args))
+        failures.append(['异常：%s %s' % (type(e), e.args)])
+        return {'msg': '执行失败'}
+
+    # 首字節耗時不包括建立連接、上傳（及使用 HTTP 緩存時已讀取返回數據）的耗時
+    add_phase('ttfb', time.perf_counter() - time_request - (get_request_phases() - phases_before))
+
+    try:
+        if export_file:
+            export_stats = export_fans_info(export_file, r)
+            add_phase('download', export_stats['download'])
+            add_phase('export', export_stats['export'])
+            add_phase('export_bytes', export_stats['bytes'])
+            logging.info('API: %s >> 文件「%s」保存成功（%s）' % (api_title, export_file, format_transfer(export_stats['bytes'], export_stats['download'] + export_stats['export'])))
+        else:
+            time_before = time.perf_counter()
+            r.content
+            add_phase('download', time.perf_counter() - time_before)
+    except requests.exceptions.RequestException as e:
+        logging.error('API: %s >> 执行失败 >>\n>> 异常：%s %s\n' % (api_title, type(e), e.args))
+        failures.append(['异常：%s %s' % (type(e), e.args)])
+        return {'msg': '执行失败'}
+
+    return check_api_response(r, export_file, res, req_data, api_title, url, check_point, failures, check_point_code)
+
+
+# 作用：找出檢查點中的導出文件名稱（check_point 中有類似 export_file == 'file_name.xls' 這樣的）
+# 參數：check_point 檢查點
+# 返回：導出文件名稱，非導出用例返回 None
+def get_export_file(check_point):
     export_file_name = re.match(r'^.*export_file *== *\'(?P<file_name>[^\']*)\'.*$', check_point)
-    if export_file_name:
-        export_file = export_file_name.group('file_name')
-        export_fans_info(export_file, r.content)
-        logging.info('API: %s >> 文件「%s」保存成功' % (api_title, export_file))
-    else:
-        pass
+    return export_file_name.group('file_name') if export_file_name else None
+
+
+# 作用：解析接口返回數據並判斷檢查點（run_api 和異步執行的 run_api_async 共用）
+# 參數：r 接口響應（requests 響應或 AsyncResponse，導出用例已保存到本地）
+#       export_file 導出文件名稱（非導出用例為 None）
+#       其他參數同 run_api
+# 返回：接口返回數據（導出用例為空字符串）；執行失敗時為 {'msg': '執行失敗'}
+def check_api_response(r, export_file, res, req_data, api_title, url, check_point, failures, check_point_code=None):
+    resp = ''
+    # 判斷接口返回結果是否為類 json 格式 { : }（只檢查首尾字符，不對整個返回結果做正則匹配）
+    if not export_file:
+        time_before = time.perf_counter()
+        resp = r.text
+        # 響應內容長度（ResponseStore 據此判斷返回數據是否寫入臨時文件，不再序列化數據來計算大小）
+        add_phase('response_bytes', len(r.content))
+        if resp[:1] == '{' and resp[-1:] == '}' and ':' in resp:
+            try:
+                resp = json.loads(resp)
+            except ValueError:
+                pass
+            #print('返回結果：%s' % (resp,))
+        add_phase('parse', time.perf_counter() - time_before)
 
+    # 檢查點中可使用的變量（見 expression_names）
+    variables = {'r': r, 'resp': resp, 'res': res, 'req_data': req_data}
+    if export_file:
+        variables['export_file'] = export_file
     try:
-        # eval 將 excel 表裏的參數轉為正確的值
-        #     eval 方法存在風險，鑑於此腳本不與外界交互，暫不考慮安全性
-        is_check_point = eval(check_point)
-    except (AttributeError, NameError, KeyError, SyntaxError, TypeError) as e:
+        # 通過表達式引擎判斷檢查點（不再使用 eval）
+        time_before = time.perf_counter()
+        is_check_point = (check_point_code or compile_expression(check_point))(variables)
+        add_phase('check', time.perf_counter() - time_before)
+    # RuntimeError：導出文件的用例在檢查點中使用了 r.text / r.content
+    except (AttributeError, NameError, KeyError, SyntaxError, TypeError, RuntimeError, IndexError, ValueError, ZeroDivisionError) as e:
         logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (api_title, type(e), e.args))
-        mail_content = '%sAPI: %s >> 執行失敗 >><br>>> 異常：%s %s<br><br>' % (mail_content, api_title, type(e), e.args)
-        return {'msg': '執行失敗'}, mail_content
+        failures.append(['異常：%s %s' % (type(e), e.args)])
+        return {'msg': '執行失敗'}
 
     if is_check_point:
         logging.info('API: %s >> 執行成功' % (api_title,))
@@ -433,16 +2450,831 @@ def run_api(req_file, res, s, url, req_method, req_data_type, req_data, api_titl
         #    resp['session_id'] = r.cookies.values()[0]
         #else:
         #    pass
-        return resp, mail_content
+        return resp
     else:
         logging.error('API: %s >> 執行失敗 >>\n>> Status Code: %d\n>> URL: %s\n>> Response: %s\n' % (api_title, r.status_code, url, resp))
-        mail_content = '%sAPI: %s >> 執行失敗 >><br>>> Status Code: %d<br>>> URL: %s<br>>> Response: %s<br><br>' % (mail_content, api_title, r.status_code, url, resp)
-        return {'msg': '執行失敗'}, mail_content
+        failures.append(['Status Code: %d' % (r.status_code,), 'URL: %s' % (url,), 'Response: %s' % (resp,)])
+        return {'msg': '執行失敗'}
+
+
+# 異步執行時的接口響應：讀取完返回數據後提供與 requests 響應相同的屬性（見 expression_attrs），供檢查點使用
+class AsyncResponse(object):
+    def __init__(self, response, content, elapsed):
+        self.status_code = response.status
+        self.reason = response.reason
+        self.headers = requests.structures.CaseInsensitiveDict(response.headers)
+        self.url = str(response.url)
+        self.encoding = response.charset or requests.utils.get_encoding_from_headers(self.headers)
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self._content = content
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    # 導出用例的返回數據已保存到本地，與 requests 一樣不可再讀取
+    @property
+    def content(self):
+        if self._content is None:
+            raise RuntimeError('The content for this response was already consumed')
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
 
 
+# HTTP 緩存中的響應（見 HttpCache），屬性同 AsyncResponse
+class CachedResponse(AsyncResponse):
+    def __init__(self, entry, content, elapsed):
+        self.status_code = entry['status']
+        self.reason = entry['reason']
+        self.headers = requests.structures.CaseInsensitiveDict(entry['headers'])
+        self.url = entry['url']
+        self.encoding = requests.utils.get_encoding_from_headers(self.headers)
+        self.elapsed = datetime.timedelta(seconds=elapsed)
+        self._content = content
+
+
+# 作用：把請求數據轉為 aiohttp 可接受的參數列表（值轉為字符串，列表展開為多個同名參數，None 忽略，與 requests 一致）
+#       multipart 請求的其他表單字段也使用此格式（見 MultipartEncoder）
+# 參數：req_data 請求數據字典
+def get_async_fields(req_data):
+    if not isinstance(req_data, dict):
+        return req_data
+    fields = []
+    for key, value in req_data.items():
+        for item in (value if isinstance(value, (list, tuple)) else [value]):
+            if item is not None:
+                fields.append((str(key), item if isinstance(item, str) else str(item)))
+    return fields
+
+
+# 作用：異步保存導出文件（同 export_fans_info）
+# 參數：export_file 導出文件名稱
+#       response aiohttp 響應
+# 返回：同 export_fans_info
+async def export_fans_info_async(export_file, response):
+    count_lines = export_file.lower().endswith(('.csv', '.txt'))
+    lines = 0
+    last_chunk = b''
+    stats = {'bytes': 0, 'download': 0, 'export': 0}
+    with open(export_file, 'wb') as xls:
+        while True:
+            time_before = time.perf_counter()
+            chunk = await response.content.read(64 * 1024)
+            time_after = time.perf_counter()
+            stats['download'] += time_after - time_before
+            if not chunk:
+                break
+            xls.write(chunk)
+            stats['export'] += time.perf_counter() - time_after
+            stats['bytes'] += len(chunk)
+            if count_lines:
+                lines += chunk.count(b'\n')
+            last_chunk = chunk
+    if count_lines:
+        save_export_rows(export_file, lines, last_chunk)
+    return stats
+
+
+# 作用：異步執行接口請求（同 run_api：表單 / JSON / multipart / get 請求、導出文件、檢查點判斷）
+# 參數：session aiohttp 會話（所有用例共用，保持登入 Cookie）
+#       其他參數同 run_api
+# 返回：同 run_api
+async def run_api_async(session, req_file, res, url, req_method, req_data_type, req_data, api_title, check_point, failures, check_point_code=None, retry_policy=None, attempt=1, http_cache=None):
+    # post 請求時指定提交數據類型（其他請求頭已在會話中設置）
+    if not req_data_type:
+        # 未選擇時指定默認值
+        req_data_type = 'application/x-www-form-urlencoded'
+    if req_data_type in content_type_headers:
+        headers = content_type_headers[req_data_type]
+    else:
+        logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_data_type」參數不正確。\n' % (api_title,))
+        failures.append(['原因：「req_data_type」參數不正確。'])
+        return {'msg': '執行失敗'}
+
+    if not retry_policy:
+        retry_policy = get_retry_policy({'api_title': api_title}, {})
+    export_file = get_export_file(check_point)
+    time_request = time.perf_counter()
+    phases_before = get_request_phases()
+    try:
+        if req_method == 'post' and req_data_type == 'application/x-www-form-urlencoded':
+            request = session.post(url, data=get_async_fields(req_data), headers=headers)
+        elif req_method == 'post' and req_data_type == 'application/json':
+            request = session.post(url, json=req_data, headers=headers)
+        elif req_method == 'post' and req_data_type == 'multipart/form-data':
+            # 逐塊讀取上傳文件發送（見 MultipartEncoder），指定 Content-Length 以免使用分塊傳輸
+            data = get_multipart_encoder(req_file, req_data)
+            request = session.post(url, data=data.iter_async(), headers=dict(headers, **{'Content-Type': data.content_type, 'Content-Length': str(len(data))}))
+        elif req_method == 'get' and http_cache and not export_file:
+            # 使用 HTTP 緩存（見下）
+            request = None
+        elif req_method == 'get':
+            request = session.get(url, params=get_async_fields(req_data) if req_data else None, headers=headers)
+        else:
+            logging.error('API: %s >> 執行失敗 >>\n>> 原因：「req_method」參數不正確。\n' % (api_title,))
+            failures.append(['原因：「req_method」參數不正確。'])
+            return {'msg': '執行失敗'}
+
+        if request is None:
+            r = await http_cache.get_async(session, url, req_data, headers)
+            # 首字節耗時不包括建立連接及讀取返回數據的耗時
+            add_phase('ttfb', time.perf_counter() - time_request - (get_request_phases() - phases_before))
+        else:
+            async with request as response:
+                # 首字節耗時不包括建立連接及上傳的耗時
+                add_phase('ttfb', time.perf_counter() - time_request - (get_request_phases() - phases_before))
+                if export_file:
+                    export_stats = await export_fans_info_async(export_file, response)
+                    add_phase('download', export_stats['download'])
+                    add_phase('export', export_stats['export'])
+                    add_phase('export_bytes', export_stats['bytes'])
+                    logging.info('API: %s >> 文件「%s」保存成功（%s）' % (api_title, export_file, format_transfer(export_stats['bytes'], export_stats['download'] + export_stats['export'])))
+                    content = None
+                else:
+                    time_before = time.perf_counter()
+                    content = await response.read()
+                    add_phase('download', time.perf_counter() - time_before)
+                r = AsyncResponse(response, content, time.perf_counter() - time_request)
+
+    # 連接異常（包括連接超時）
+    except aiohttp.ClientConnectionError as e:
+        if attempt >= retry_policy['times']:
+            logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (api_title, type(e), e.args))
+            failures.append(['異常：%s %s' % (type(e), e.args)])
+            return {'msg': '執行失敗'}
+        retry_time = get_retry_delay(retry_policy, attempt)
+        logging.error('API: %s >> 執行失敗 >>\n>> 連接異常，%.1f 秒後重試（第 %d 次嘗試）' % (api_title, retry_time, attempt))
+        raise RetryCase(retry_time, attempt)
+
+    # 找不到指定的上傳文件、上傳文件的表單字段不正確、其他請求異常、超時
+    except (aiohttp.ClientError, asyncio.TimeoutError, FileNotFoundError, UploadFieldsError) as e:
+        logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (api_title, type(e), e.args))
+        failures.append(['異常：%s %s' % (type(e), e.args)])
+        return {'msg': '執行失敗'}
+
+    return check_api_response(r, export_file, res, req_data, api_title, url, check_point, failures, check_point_code)
+
+
+# 作用：異步執行單條測試用例，連接異常時不阻塞地等待後重試（同 run_test_case_with_retry）
+# 參數：test_case 單條測試用例
+#       context 異步執行的共用數據（見 run_test_cases_async）
+#       index 用例序號（用於開始執行 / 重試事件）
+#       tries 事件中的嘗試次數（同 run_test_case_with_retry，可選）
+# 返回：同 run_test_case
+async def run_test_case_async(test_case, context, index=None, tries=None):
+    tries = tries if tries is not None else {'attempt': 0}   # 每次開始執行前加 1
+    failures = []
+    res, basic_data = context['res'], context['basic_data']
+    is_ready, req_data = get_req_data(test_case, res, basic_data, failures)
+    if not is_ready:
+        return failures, None
+
+    retry_policy = get_retry_policy(test_case, basic_data)
+    phases = start_phases()
+    time_spend = 0
+    attempt = 1
+    while True:
+        # 只在發送請求時佔用並發數；等待並發數的時間不計入耗時，等待重試的時間計入
+        async with context['semaphore']:
+            tries['attempt'] += 1
+            emit_start(context['report'], index, test_case, tries['attempt'])
+            time_before = time.perf_counter()
+            try:
+                resp = await run_api_async(context['session'], test_case['req_file'], res, test_case['api_url'], test_case['req_method'], test_case['req_data_type'], req_data, test_case['api_title'], test_case['check_point'], failures, test_case.get('check_point_code'), retry_policy, attempt,
+                                           context['http_cache'] if use_http_cache(test_case) else None)
+                save_response(res, test_case['api_id'], resp, phases.get('response_bytes', 0))
+                retry = None
+            except RetryCase as e:
+                retry = e
+            time_spend += time.perf_counter() - time_before
+        if not retry:
+            break
+        emit_retry(context['report'], index, test_case, tries['attempt'], retry.delay)
+        await asyncio.sleep(retry.delay)
+        time_spend += retry.delay
+        phases['retry_wait'] = phases.get('retry_wait', 0) + retry.delay
+        attempt += 1
+    return failures, {'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'time_spend': time_spend, 'phases': phases}
+
+
+# 作用：異步執行登入用例（同 run_login_case）
+# 參數：同 run_test_case_async
+# 返回：同 run_login_case
+async def run_login_case_async(test_case, context, index=None):
+    login_policy = get_login_policy(test_case, context['basic_data'])
+    tries = {'attempt': 0}
+    # 嘗試 3 次登入（由於業務要求第 4 次起需要驗證碼，無法再次嘗試）
+    for count in range(1, 4):
+        failures, time_item = await run_test_case_async(test_case, context, index, tries)
+        # 用例數據有誤未能執行接口時，與普通用例一樣只記錄錯誤
+        if not time_item:
+            return failures, time_item, True
+        if is_login_success(context['res'][test_case['api_id']], context['basic_data']):
+            return failures if count == 1 else [], time_item, True
+        # 儲存第一次登入失敗的信息，多次嘗試後還是失敗時只保留這個紀錄
+        if count == 1:
+            temp_failures = failures
+        if count == 3:
+            break
+        retry_time = get_retry_delay(login_policy, count)
+        logging.error('API: %s >> 執行失敗 >>\n>> 登入失敗，%.1f 秒後重試' % (test_case['api_title'], retry_time))
+        emit_retry(context['report'], index, test_case, tries['attempt'], retry_time)
+        await asyncio.sleep(retry_time)
+    return temp_failures, time_item, False
+
+
+# 作用：等待依賴的用例執行完後異步執行一條用例，並記錄執行結果
+# 參數：index 用例序號
+#       test_case 測試用例
+#       deps 需等待的用例（asyncio 任務）
+#       consumers 用例引用的 api_id 集合（執行完後釋放，見 ResponseStore）
+#       context 同 run_test_case_async
+async def run_case_task(index, test_case, deps, consumers, context):
+    try:
+        if deps:
+            await asyncio.wait(deps)
+        # 登入失敗時不再執行其他用例
+        if context['login_failed']:
+            return
+        try:
+            if is_login_case(test_case):
+                result = await run_login_case_async(test_case, context, index)
+            else:
+                result = await run_test_case_async(test_case, context, index)
+        # 任務的異常沒有其他地方讀取，記為該用例執行失敗，以免用例從執行結果中消失
+        except Exception as e:
+            logging.error('API: %s >> 執行失敗 >>\n>> 異常：%s %s\n' % (test_case['api_title'], type(e), e.args))
+            result = ([['URL: %s' % (test_case['api_url'],), '異常：%s %s' % (type(e), e.args)]], None, False)
+        if is_login_case(test_case) and not result[2]:
+            context['login_failed'] = True
+        collect_result(index, test_case, result, context['report'], context['case_results'])
+    finally:
+        context['res'].release(consumers)
+
+
+# 作用：異步執行測試用例（「Basic Data」中 engine 設置為 async 時使用，需安裝 aiohttp）
+#       調度規則同 run_test_cases：按引用關係等待，登入用例為屏障；同時發送的請求數由 max_workers 決定（可設置為上千）
+#       所有用例共用一個 aiohttp 會話（共用 Cookie），連接及讀取超時同 run_api（7 秒，上傳大文件不限總時間）
+# 參數：test_cases / res / basic_data / report 同 run_test_cases
+#       http_cache get 請求使用的 HTTP 緩存（見 HttpCache，不使用時為 None）
+# 返回：每條用例的執行結果（見 collect_result）和連接池使用情況
+async def run_test_cases_async(test_cases, res, basic_data, report, http_cache=None):
+    max_workers = get_max_workers(basic_data)
+    logging.info('>>>>> 異步執行測試用例，最大並發數：%d <<<<<' % (max_workers,))
+    pool_item = {'host': '所有主機（aiohttp）', 'requests': 0, 'connections': 0, 'idle': None, 'maxsize': max_workers}
+
+    # 記錄建立連接的耗時及連接池使用情況
+    trace = aiohttp.TraceConfig()
+    async def on_request_start(session, trace_context, params):
+        pool_item['requests'] += 1
+    async def on_connection_create_start(session, trace_context, params):
+        trace_context.connect_before = time.perf_counter()
+    async def on_connection_create_end(session, trace_context, params):
+        pool_item['connections'] += 1
+        add_phase('connect', time.perf_counter() - trace_context.connect_before)
+    trace.on_request_start.append(on_request_start)
+    trace.on_connection_create_start.append(on_connection_create_start)
+    trace.on_connection_create_end.append(on_connection_create_end)
+
+    context = {'res': res, 'basic_data': basic_data, 'report': report, 'case_results': [], 'login_failed': False,
+               'semaphore': asyncio.Semaphore(max_workers), 'http_cache': http_cache}
+    running = set()
+    last_task = {}      # api_id -> 最近一條該 api_id 用例的任務
+    readers = {}        # api_id -> 最近一條該 api_id 用例之後引用它的用例任務
+    barrier = None      # 最近一條登入用例的任務
+    since_barrier = []  # 最近一條登入用例之後的用例任務（下一條登入用例需等待）
+    # unsafe=True：服務器地址為 IP 時也保存 Cookie
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_workers), cookie_jar=aiohttp.CookieJar(unsafe=True), headers=default_headers,
+                                     timeout=aiohttp.ClientTimeout(sock_connect=7, sock_read=7), trace_configs=[trace]) as session:
+        context['session'] = session
+        for index, test_case in enumerate(test_cases):
+            refs = get_case_refs(test_case)
+            if is_login_case(test_case):
+                # 登入用例須等待之前的用例全部執行完，並在登入後判斷是否登入成功
+                deps = since_barrier + ([barrier] if barrier else [])
+                consumers = refs | {test_case['api_id']}
+            else:
+                deps = get_case_deps(test_case, refs, last_task, readers) + ([barrier] if barrier else [])
+                consumers = refs
+            res.add_consumers(consumers)
+            task = asyncio.ensure_future(run_case_task(index, test_case, deps, consumers, context))
+            running.add(task)
+            task.add_done_callback(running.discard)
+            add_case_access(test_case, refs, last_task, readers, task)
+            if is_login_case(test_case):
+                barrier = task
+                since_barrier = []
+            else:
+                since_barrier.append(task)
+            # 邊讀取邊執行：讓已可執行的用例先開始
+            await asyncio.sleep(0)
+        res.seal()
+        while running:
+            await asyncio.wait(list(running))
+
+    if context['login_failed']:
+        logging.error('\n>>>>> 登入失敗！無法進行更多的接口測試！ <<<<<\n')
+        report.emit({'event': 'login_failed'})
+    return context['case_results'], [pool_item]
+
+
+# 作用：獲取已排序數據的百分位數（nearest-rank）
+# 參數：values 已排序的數據列表
+#       percent 百分位（如 95）
+def get_percentile(values, percent):
+    if not values:
+        return 0
+    # 排名為 ceil(percent% × n)，如 10 個數據的 p50 為第 5 個
+    index = max(int(math.ceil(percent / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+# 作用：把本次各接口的執行時間累計到歷史響應時間直方圖（按 api_id 保存，跨多次執行累計）
+# 參數：histogram_file 直方圖保存路徑
+#       time_record 本次接口執行時間紀錄
+# 返回：累計後的直方圖 {api_id: {'buckets': [各區間次數], 'count': 次數, 'sum': 總耗時（秒）}}
+def update_latency_histogram(histogram_file, time_record):
+    try:
+        with open(histogram_file, encoding='utf-8') as f:
+            histograms = json.load(f)
+    except FileNotFoundError:
+        histograms = {}
+    except ValueError as e:
+        logging.warning('響應時間直方圖「%s」無法讀取，重新開始記錄 >> 異常：%s %s' % (histogram_file, type(e), e.args))
+        histograms = {}
+
+    for item in time_record:
+        histogram = histograms.setdefault(item['api_id'], {'buckets': [0] * (len(latency_buckets) + 1), 'count': 0, 'sum': 0})
+        time_ms = item['time_spend'] * 1000
+        index = len(latency_buckets)
+        for i, bound in enumerate(latency_buckets):
+            if time_ms <= bound:
+                index = i
+                break
+        histogram['buckets'][index] += 1
+        histogram['count'] += 1
+        histogram['sum'] += item['time_spend']
+
+    try:
+        with open(histogram_file, 'w', encoding='utf-8') as f:
+            json.dump(histograms, f)
+    except OSError as e:
+        logging.warning('響應時間直方圖「%s」保存失敗 >> 異常：%s %s' % (histogram_file, type(e), e.args))
+    return histograms
+
+
+# 作用：從直方圖估算百分位數（取所在區間的上限）
+# 參數：histogram 單個接口的直方圖
+#       percent 百分位（如 95）
+# 返回：響應時間（毫秒）；落在最後一個區間之後時返回 None
+def get_histogram_percentile(histogram, percent):
+    rank = percent / 100.0 * histogram['count']
+    total = 0
+    for i, count in enumerate(histogram['buckets']):
+        total += count
+        if count and total >= rank:
+            return latency_buckets[i] if i < len(latency_buckets) else None
+    return None
+
+
+# 作用：把本次各用例的執行結果保存到執行歷史（SQLite）
+# 參數：history_file 執行歷史保存路徑
+#       test_case_file 測試用例文件
+#       case_results 每條用例的執行結果（見 collect_result）
+# 返回：本次執行的 run_id；保存失敗時返回 None
+def save_run_history(history_file, test_case_file, case_results):
+    try:
+        conn = sqlite3.connect(history_file)
+        try:
+            with conn:
+                conn.execute('CREATE TABLE IF NOT EXISTS runs (run_id INTEGER PRIMARY KEY AUTOINCREMENT, started_at TEXT, test_case_file TEXT, passed INTEGER, failed INTEGER)')
+                conn.execute('CREATE TABLE IF NOT EXISTS case_results (run_id INTEGER, api_id TEXT, api_title TEXT, success INTEGER, time_spend REAL, phases TEXT)')
+                conn.execute('CREATE INDEX IF NOT EXISTS case_results_api_id ON case_results (api_id, run_id)')
+                passed = sum(1 for item in case_results if item['success'])
+                cursor = conn.execute('INSERT INTO runs (started_at, test_case_file, passed, failed) VALUES (?, ?, ?, ?)',
+                                      (time.strftime('%Y-%m-%d %H:%M:%S'), os.path.abspath(test_case_file), passed, len(case_results) - passed))
+                run_id = cursor.lastrowid
+                conn.executemany('INSERT INTO case_results VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(run_id, item['api_id'], item['api_title'], int(item['success']), item['time_spend'], json.dumps(item['phases'])) for item in case_results])
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning('執行歷史「%s」保存失敗 >> 異常：%s %s' % (history_file, type(e), e.args))
+        return None
+    return run_id
+
+
+# 作用：找出本次響應時間比歷史基準明顯變慢的接口
+#       基準為該接口之前最近 regression_window 次（默認 10）成功執行時間的中位數，至少需要 3 次紀錄；
+#       本次執行時間超過基準的 regression_ratio 倍（默認 1.5）且多出 regression_min 秒（默認 0.1）時視為退化
+#       （以上參數可在「Basic Data」中設置）
+# 參數：history_file 執行歷史保存路徑
+#       run_id 本次執行的 run_id
+#       basic_data Excel 中基礎數據
+# 返回：退化的接口列表 [{'api_id', 'api_title', 'time_spend', 'baseline', 'samples', 'window'}]
+def get_latency_regressions(history_file, run_id, basic_data):
+    try:
+        window = int(basic_data.get('regression_window') or 10)
+        ratio = float(basic_data.get('regression_ratio') or 1.5)
+        min_delta = float(basic_data.get('regression_min') or 0.1)
+    except ValueError:
+        logging.error('「regression_window / regression_ratio / regression_min」參數不正確，不進行響應時間退化檢查')
+        return []
+
+    regressions = []
+    try:
+        conn = sqlite3.connect(history_file)
+        try:
+            current = conn.execute('SELECT api_id, api_title, time_spend FROM case_results WHERE run_id = ? AND success = 1', (run_id,)).fetchall()
+            for api_id, api_title, time_spend in current:
+                history = [row[0] for row in conn.execute('SELECT time_spend FROM case_results WHERE api_id = ? AND run_id < ? AND success = 1 ORDER BY run_id DESC LIMIT ?', (api_id, run_id, window))]
+                if len(history) < 3:
+                    continue
+                baseline = statistics.median(history)
+                if time_spend > baseline * ratio and time_spend - baseline > min_delta:
+                    regressions.append({'api_id': api_id, 'api_title': api_title, 'time_spend': time_spend, 'baseline': baseline, 'samples': len(history), 'window': window})
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.warning('執行歷史「%s」讀取失敗 >> 異常：%s %s' % (history_file, type(e), e.args))
+    return regressions
+
+
+# 作用：把各階段耗時轉為文字，如「連接 0.012 / 首字節 0.105」（有上傳 / 導出文件時附加大小及速度）
+# 參數：phases 各階段耗時字典
+def format_phases(phases):
+    content = ' / '.join('%s %.3f' % (title, phases[name]) for name, title in phase_names if name in phases)
+    if 'upload_bytes' in phases:
+        content = '%s / 上傳文件 %s' % (content, format_transfer(phases['upload_bytes'], phases.get('upload', 0)))
+    if 'export_bytes' in phases:
+        content = '%s / 導出文件 %s' % (content, format_transfer(phases['export_bytes'], phases.get('download', 0) + phases.get('export', 0)))
+    return content
+
+
+# 作用：把傳輸字節數和耗時轉為文字，如「12.50 MB，8.31 MB/s」
+# 參數：size 字節數
+#       seconds 耗時（秒）
+def format_transfer(size, seconds):
+    return '%.2f MB，%.2f MB/s' % (size / 1048576.0, size / 1048576.0 / seconds if seconds else 0)
+
+
+# 作用：壓力測試中單個虛擬用戶：使用獨立會話登入後，按目標每秒請求數循環執行用例直到結束時間
+#       每個虛擬用戶使用獨立的會話池（各自登入）
+# 參數：setup_cases 登入用例及其之前的用例（每個虛擬用戶執行一次）
+#       replay_cases 需重複執行的用例
+#       basic_data Excel 中基礎數據
+#       pacer 請求節奏控制 {'lock', 'next_slot', 'interval', 'end_time', 'sequence'}
+#       stats 統計結果 {api_id: {'latency': [], 'errors': 0}}（與 pacer 共用同一把鎖）
+#       report 報告（每個請求發送開始執行及執行完的事件，序號為所有虛擬用戶的請求順序）
+def run_load_user(setup_cases, replay_cases, basic_data, pacer, stats, report):
+    sessions = SessionPool(basic_data)
+    try:
+        res = {}
+        for test_case in setup_cases:
+            if is_login_case(test_case):
+                content, time_item, login_success = run_login_case(test_case, res, sessions, basic_data)
+                if not login_success:
+                    logging.error('壓力測試：虛擬用戶登入失敗，不再執行用例')
+                    return
+            else:
+                run_test_case_with_retry(test_case, res, sessions, basic_data)
+
+        while True:
+            for test_case in replay_cases:
+                # 所有虛擬用戶共用一個節奏，每個請求佔用一個時間槽
+                with pacer['lock']:
+                    slot = max(pacer['next_slot'], time.perf_counter())
+                    pacer['next_slot'] = slot + pacer['interval']
+                    sequence = pacer['sequence']
+                    pacer['sequence'] += 1
+                if slot >= pacer['end_time']:
+                    return
+                time.sleep(max(slot - time.perf_counter(), 0))
+
+                # 壓力測試中連接異常直接計為錯誤，不再重試（當作最後一次嘗試）
+                emit_start(report, sequence, test_case, 1)
+                time_before = time.perf_counter()
+                content, time_item = run_test_case(test_case, res, sessions, basic_data, get_retry_policy(test_case, basic_data)['times'])
+                time_spend = time.perf_counter() - time_before
+                # 各虛擬用戶共用統計結果，計數需加鎖
+                with pacer['lock']:
+                    item = stats[test_case['api_id']]
+                    item['latency'].append(time_spend)
+                    if content:
+                        item['errors'] += 1
+                report.emit(get_case_event(sequence, test_case, (content, dict(time_item, time_spend=time_spend) if time_item else None)))
+    finally:
+        sessions.close()
+
+
+# 作用：壓力測試模式：多個虛擬用戶（各自登入）按目標每秒請求數重複執行需執行的用例，
+#       統計每個接口的吞吐量、錯誤率及 p50 / p95 / p99 響應時間
+#       「Basic Data」中設置：load_users 虛擬用戶數（默認 10）；load_rps 目標每秒請求數（默認 10）；
+#                             load_duration 持續時間（秒，默認 60）
+# 參數：test_case_file / sheet1 / sheet2 同 get_test_case
+#       sinks 報告輸出（每個請求一個 case 事件，如 MetricsSink / JsonlSink；壓力測試結果另外郵件下發）
+def run_load_test(test_case_file, sheet1, sheet2, sinks=()):
+    basic_data, test_cases = load_test_case_file(test_case_file, sheet1, sheet2)
+    test_cases = list(test_cases)
+    try:
+        users = max(int(basic_data.get('load_users') or 10), 1)
+        rps = float(basic_data.get('load_rps') or 10)
+        duration = float(basic_data.get('load_duration') or 60)
+    except ValueError:
+        logging.error('>>>>> 壓力測試參數（load_users / load_rps / load_duration）不正確 <<<<<')
+        return
+
+    # 登入用例及其之前的用例（如獲取驗證碼）只在每個虛擬用戶開始時執行一次
+    login_index = -1
+    for index, test_case in enumerate(test_cases):
+        if is_login_case(test_case):
+            login_index = index
+    setup_cases = test_cases[:login_index + 1]
+    replay_cases = test_cases[login_index + 1:]
+    if not replay_cases:
+        logging.error('壓力測試：沒有可重複執行的用例\n')
+        return
+
+    logging.info('>>>>> 壓力測試開始：虛擬用戶 %d，目標 %s 請求/秒，持續 %s 秒 <<<<<' % (users, rps, duration))
+    stats = dict((test_case['api_id'], {'api_title': test_case['api_title'], 'latency': [], 'errors': 0}) for test_case in replay_cases)
+    start_time = time.perf_counter()
+    pacer = {'lock': threading.Lock(), 'next_slot': start_time, 'interval': 1.0 / rps, 'end_time': start_time + duration, 'sequence': 0}
+    report = Report(sinks)
+    threads = [threading.Thread(target=run_load_user, args=(setup_cases, replay_cases, basic_data, pacer, stats, report)) for i in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+    report.close()
+
+    total = sum(len(item['latency']) for item in stats.values())
+    errors = sum(item['errors'] for item in stats.values())
+    log_content = '壓力測試結果：共 %d 個請求，吞吐量 %.2f 請求/秒，錯誤率 %.2f%%' % (total, total / elapsed, errors * 100.0 / max(total, 1))
+    mail_content = '%s<br><br>接口名稱 : 請求數 / 吞吐量（請求/秒） / 錯誤率 / p50 / p95 / p99（秒）' % (log_content,)
+    for api_id, item in stats.items():
+        latency = sorted(item['latency'])
+        line = '%s : %d / %.2f / %.2f%% / %.3f / %.3f / %.3f' % (item['api_title'], len(latency), len(latency) / elapsed, item['errors'] * 100.0 / max(len(latency), 1), get_percentile(latency, 50), get_percentile(latency, 95), get_percentile(latency, 99))
+        log_content = '%s\n%s' % (log_content, line)
+        mail_content = '%s<br>%s' % (mail_content, line)
+    logging.info('\n>>>>> %s <<<<<\n' % (log_content,))
+
+    # if_mail 同接口測試：1 每次都下發郵件；2 僅有請求出錯時下發郵件
+    if basic_data['if_mail'] == 1 or (basic_data['if_mail'] == 2 and errors):
+        mail_to = basic_data['mail_to_all'].strip().replace(' ', '').split(',')
+        send_mail(basic_data['mail_host'], basic_data['mail_from'], basic_data['mail_pwd'], mail_to, '%s〔壓力測試〕' % (basic_data['mail_sub'],), mail_content)
+
+
+# 作用：把用例分為多個分片（分佈式執行用）
+#       第一條登入用例及其之前的用例（準備用例，如獲取驗證碼、登入）每個分片都執行一次；
+#       其餘用例按引用關係（res['api_id']）及相同 api_id 分組，同一組在同一分片內按原順序執行，各分片用例數盡量平均；
+#       之後再次登入（如切換用戶）時，該登入用例及其之後的用例都依賴新的登入狀態，歸為同一組
+# 參數：test_cases 需執行的測試用例列表
+#       count 分片數
+# 返回：分片列表，每個分片為 (準備用例數, [(序號, 用例), ...])；用例數不足時分片數會少於 count
+def split_shards(test_cases, count):
+    login_index = -1
+    for index, test_case in enumerate(test_cases):
+        if is_login_case(test_case):
+            login_index = index
+            break
+    setup = list(enumerate(test_cases[:login_index + 1]))
+
+    # 並查集：有引用關係的用例歸為一組
+    parent = {}
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+    last_index = {}
+    barrier = None      # 準備用例之後最近一條登入用例的序號
+    for index in range(login_index + 1, len(test_cases)):
+        test_case = test_cases[index]
+        parent[index] = index
+        if is_login_case(test_case):
+            barrier = index
+        elif barrier is not None:
+            parent[find(index)] = find(barrier)
+        for api_id in get_case_refs(test_case) | {test_case['api_id']}:
+            if api_id in last_index:
+                parent[find(index)] = find(last_index[api_id])
+        last_index[test_case['api_id']] = index
+    groups = {}
+    for index in sorted(parent):
+        groups.setdefault(find(index), []).append(index)
+
+    # 較大的組先分配，每次分配給用例最少的分片
+    shards = [[] for i in range(max(min(count, len(groups)), 1))]
+    for group in sorted(groups.values(), key=len, reverse=True):
+        min(shards, key=len).extend(group)
+    return [(len(setup), setup + [(index, test_cases[index]) for index in sorted(shard)]) for shard in shards]
+
+
+# 收集報告事件（分佈式執行時工作進程把事件返回給協調進程）
+class CollectSink(object):
+    def __init__(self):
+        self.events = []
+
+    def handle(self, event):
+        self.events.append(event)
+
+    def close(self):
+        pass
+
+
+# 作用：執行一個分片的用例（工作進程 / 遠程工作節點中執行，使用獨立的會話池和返回數據存儲）
+# 參數：basic_data Excel 中基礎數據
+#       test_cases 分片中的測試用例（未編譯，見 get_shard_cases）
+#       sinks 工作節點本地的報告輸出（如 MetricsSink，不會關閉）
+# 返回：{'events': 報告事件列表（序號為分片內序號）, 'pool_stats': 連接池使用情況}
+def run_shard(basic_data, test_cases, sinks=()):
+    sink = CollectSink()
+    case_results, pool_stats = run_engine((compile_test_case(dict(test_case)) for test_case in test_cases), basic_data, Report([sink] + list(sinks)))
+    return {'events': sink.events, 'pool_stats': pool_stats}
+
+
+# 作用：去掉用例中已編譯的表達式（語法樹、可執行函數），以便發送給工作進程後重新編譯
+# 參數：shard split_shards 返回的一個分片
+def get_shard_cases(shard):
+    return [dict((key, value) for key, value in test_case.items() if not key.endswith(('_tree', '_code'))) for index, test_case in shard[1]]
+
+
+# 作用：分佈式執行：協調進程把用例分片後交給本地工作進程或遠程工作節點（-m worker）執行，
+#       合併各分片的執行結果（按 Excel 行順序）發送到報告
+# 參數：test_cases 需執行的測試用例列表
+#       basic_data Excel 中基礎數據
+#       report 報告
+#       workers 本地工作進程數
+#       worker_urls 遠程工作節點地址列表（如 http://10.0.0.2:8900）
+#       worker_token 與遠程工作節點共享的令牌
+# 返回：每條用例的執行結果和各分片的連接池使用情況
+def run_distributed(test_cases, basic_data, report, workers, worker_urls, worker_token=None):
+    shards = split_shards(test_cases, workers + len(worker_urls))
+    logging.info('>>>>> 分佈式執行：%d 個分片（本地工作進程 %d，遠程工作節點 %d） <<<<<' % (len(shards), workers, len(worker_urls)))
+    case_results = []
+    pool_stats = []
+    futures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(worker_urls), 1)) as remote, \
+            concurrent.futures.ProcessPoolExecutor(max_workers=max(workers, 1)) as local:
+        for number, shard in enumerate(shards):
+            if number < len(worker_urls):
+                future = remote.submit(post_shard, worker_urls[number], basic_data, get_shard_cases(shard), worker_token)
+            else:
+                future = local.submit(run_shard, basic_data, get_shard_cases(shard))
+            futures[future] = number
+
+        # 哪個分片先執行完就先合併哪個分片的結果
+        for future in concurrent.futures.as_completed(futures):
+            number = futures[future]
+            setup_count, shard = shards[number]
+            try:
+                result = future.result()
+            except Exception as e:
+                logging.error('分片 %d 執行失敗 >> 異常：%s %s' % (number + 1, type(e), e.args))
+                result = {'events': [], 'pool_stats': []}
+                for local_index, (index, test_case) in enumerate(shard):
+                    result['events'].append({'event': 'case', 'index': local_index, 'api_id': test_case['api_id'], 'api_title': test_case['api_title'], 'api_url': test_case['api_url'],
+                                             'success': False, 'failures': [['原因：分片 %d 執行失敗 - %s %s' % (number + 1, type(e), e.args)]], 'time_spend': None, 'phases': {}})
+            for event in result['events']:
+                if event['event'] in ('case', 'start', 'retry'):
+                    # 準備用例每個分片都執行，只保留第一個分片的結果（其他分片失敗時也保留）
+                    if event['index'] < setup_count and number and (event['event'] != 'case' or event['success']):
+                        continue
+                    event['index'] = shard[event['index']][0]
+                if event['event'] == 'case':
+                    case_results.append(event)
+                report.emit(event)
+            for item in result['pool_stats']:
+                item['host'] = '%s（分片 %d）' % (item['host'], number + 1)
+                pool_stats.append(item)
+    return case_results, pool_stats
+
+
+# 作用：把分片發送給遠程工作節點執行（POST /shard，JSON 格式）
+# 參數：worker_url 遠程工作節點地址
+#       basic_data / test_cases 同 run_shard
+#       worker_token 與工作節點共享的令牌
+# 返回：同 run_shard
+def post_shard(worker_url, basic_data, test_cases, worker_token=None):
+    data = json.dumps({'basic_data': basic_data, 'test_cases': test_cases}, default=str)
+    headers = {'Content-Type': 'application/json; charset=UTF-8'}
+    if worker_token:
+        headers[worker_token_header] = worker_token
+    r = requests.post('%s/shard' % (worker_url.rstrip('/'),), data=data.encode('utf-8'), headers=headers, timeout=worker_timeout)
+    r.raise_for_status()
+    return r.json()
+
+
+# 遠程工作節點：接收協調進程發送的分片（POST /shard），執行後返回結果（見 run_shard）
+#     分片可指定導出文件路徑和上傳文件，設置了令牌時只接受請求頭中帶有相同令牌的分片
+class WorkerHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_json(200, {'status': 'ok'})
+
+    def do_POST(self):
+        if self.path != '/shard':
+            self.send_json(404, {'error': 'not found'})
+            return
+        token = self.server.token
+        if token and not hmac.compare_digest(self.headers.get(worker_token_header, '').encode('utf-8'), token.encode('utf-8')):
+            logging.warning('工作節點：拒絕令牌不正確的分片（來自 %s）' % (self.client_address[0],))
+            self.send_json(403, {'error': 'invalid worker token'})
+            return
+        try:
+            spec = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode('utf-8'))
+            basic_data, test_cases = spec['basic_data'], spec['test_cases']
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_json(400, {'error': '%s %s' % (type(e), e.args)})
+            return
+        logging.info('工作節點：收到分片（%d 條用例）' % (len(test_cases),))
+        self.send_json(200, run_shard(basic_data, test_cases, self.server.sinks))
+
+    # 作用：返回 JSON 響應
+    # 參數：status 狀態碼
+    #       data 返回數據
+    def send_json(self, status, data):
+        body = json.dumps(data, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('工作節點：%s' % (format % args,))
+
+
+# 作用：判斷監聽地址是否只接受本機連接
+# 參數：host 監聽地址中的主機部分
+def is_loopback_host(host):
+    if host in ('', 'localhost'):
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+
+# 作用：啟動遠程工作節點（-m worker），直到手動停止
+#       監聽非本機地址時必須設置令牌（分片可寫入導出文件、讀取上傳文件）
+# 參數：listen 監聽地址，如 0.0.0.0:8900
+#       sinks 工作節點本地的報告輸出（如 MetricsSink，各分片共用）
+#       token 與協調進程共享的令牌（--worker-token），協調進程需設置相同的令牌
+def run_worker(listen, sinks=(), token=None):
+    host, _, port = listen.rpartition(':')
+    if not token and not is_loopback_host(host):
+        sys.exit('>>>>> 工作節點監聽非本機地址（%s）時須設置 --worker-token 或環境變量 API_TEST_WORKER_TOKEN <<<<<\n' % (listen,))
+    server = http.server.ThreadingHTTPServer((host.strip('[]') or '127.0.0.1', int(port)), WorkerHandler)
+    server.sinks = list(sinks)
+    server.token = token
+    logging.info('>>>>> 工作節點已啟動：http://%s:%s <<<<<' % (host or '127.0.0.1', port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        for sink in server.sinks:
+            sink.close()
+
 
 def main():
-    get_test_case(test_case_file, sheet1, sheet2)
+    parser = argparse.ArgumentParser(description='通過 xlsx 文件上的用例執行接口測試')
+    parser.add_argument('-f', '--file', default=test_case_file, help='測試用例文件（默認：%(default)s）')
+    parser.add_argument('-m', '--mode', choices=('test', 'load', 'worker'), default='test', help='test 接口測試（默認）；load 壓力測試；worker 遠程工作節點')
+    parser.add_argument('--console', action='store_true', help='在控制台逐條顯示用例執行結果')
+    parser.add_argument('--junit', metavar='FILE', help='輸出 JUnit XML 報告')
+    parser.add_argument('--jsonl', metavar='FILE', help='輸出 JSONL 報告（每個事件一行）')
+    parser.add_argument('-w', '--workers', type=int, default=1, help='本地工作進程數，大於 1 時按引用關係分片並行執行（默認：%(default)s）')
+    parser.add_argument('--worker-url', action='append', default=[], help='遠程工作節點地址（可多個），如 http://10.0.0.2:8900')
+    parser.add_argument('--listen', default='127.0.0.1:8900', help='工作節點監聽地址（-m worker，默認：%(default)s）；非本機地址須設置 --worker-token')
+    parser.add_argument('--worker-token', default=os.environ.get('API_TEST_WORKER_TOKEN'), help='協調進程與遠程工作節點共享的令牌，兩端須一致（默認取環境變量 API_TEST_WORKER_TOKEN）')
+    parser.add_argument('--metrics', metavar='HOST:PORT', help='執行過程中提供 Prometheus 格式的實時指標（http://HOST:PORT/metrics）')
+    parser.add_argument('--status-file', metavar='FILE', help='執行過程中定期重寫的狀態文件（JSON）')
+    parser.add_argument('--status-interval', type=float, default=5, help='狀態文件重寫間隔（秒，默認：%(default)s）')
+    parser.add_argument('--metrics-window', type=float, default=60, help='實時指標中響應時間分位數的統計窗口（秒，默認：%(default)s）')
+    args = parser.parse_args()
+
+    sinks = []
+    if args.metrics or args.status_file:
+        sinks.append(MetricsSink(args.metrics, args.status_file, args.metrics_window, args.status_interval))
+    if args.mode == 'worker':
+        run_worker(args.listen, sinks, args.worker_token)
+        return
+    if args.console:
+        sinks.append(ConsoleSink())
+    if args.junit:
+        sinks.append(JUnitSink(args.junit))
+    if args.jsonl:
+        sinks.append(JsonlSink(args.jsonl))
+    if args.mode == 'load':
+        run_load_test(args.file, sheet1, sheet2, sinks)
+    else:
+        get_test_case(args.file, sheet1, sheet2, sinks, args.workers, args.worker_url, args.worker_token)
 
 
 if __name__ == '__main__':